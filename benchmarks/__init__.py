@@ -0,0 +1,5 @@
+"""
+Benchmarks of the OPT4048 driver. Run them with:
+
+    python -m benchmarks [api|decode|convert_batch] [options]
+"""
@@ -0,0 +1,40 @@
+# -------------------------------------------------------------------------------
+# __main__.py
+#
+# Command line entry point of the OPT4048 benchmarks.
+# -------------------------------------------------------------------------------
+# Written by SparkFun Electronics, November 2023
+#
+# This python library supports the SparkFun Electroncis Qwiic ecosystem
+#
+# More information on Qwiic is at https://www.sparkfun.com/qwiic
+# ===============================================================================
+# SPDX-License-Identifier: MIT
+#
+# Copyright (c) 2023 SparkFun Electronics
+# ===============================================================================
+
+import sys
+
+
+def main(argv):
+    name = argv[0] if argv and not argv[0].startswith("-") else "api"
+    args = argv[1:] if argv and argv[0] == name else argv
+
+    if name == "api":
+        from benchmarks import bench_api
+
+        bench_api.main(args)
+    elif name == "decode":
+        from benchmarks import bench_decode
+
+        bench_decode.main(*map(int, args))
+    elif name == "convert_batch":
+        from benchmarks import bench_convert_batch
+
+        bench_convert_batch.main(*map(int, args))
+    else:
+        sys.exit("Unknown benchmark %r, use api, decode or convert_batch" % name)
+
+
+main(sys.argv[1:])
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -------------------------------------------------------------------------------
+# bench_api.py
+#
+# Measures the bus traffic, time and memory of each public QwOpt4048 API on a
+# simulated device.
+# -------------------------------------------------------------------------------
+# Written by SparkFun Electronics, November 2023
+#
+# This python library supports the SparkFun Electroncis Qwiic ecosystem
+#
+# More information on Qwiic is at https://www.sparkfun.com/qwiic
+# ===============================================================================
+# SPDX-License-Identifier: MIT
+#
+# Copyright (c) 2023 SparkFun Electronics
+# ===============================================================================
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import qwiic_opt4048
+import opt4048_registers as REGS
+import opt4048_buffer
+import opt4048_simulator
+
+
+class CountingDriver:
+    """
+    I2C driver proxy that counts the transactions and bytes passed through it.
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.reset()
+
+    def reset(self):
+        self.reads = 0
+        self.writes = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    @property
+    def transactions(self):
+        return self.reads + self.writes
+
+    def isDeviceConnected(self, address):
+        return self.driver.isDeviceConnected(address)
+
+    def readBlock(self, address, commandCode, nBytes):
+        self.reads += 1
+        self.bytes_read += nBytes
+        return self.driver.readBlock(address, commandCode, nBytes)
+
+    def writeBlock(self, address, commandCode, value):
+        self.writes += 1
+        self.bytes_written += len(value)
+        self.driver.writeBlock(address, commandCode, value)
+
+
+def bus_seconds(transactions, nbytes, bus_speed):
+    """
+    Time spent on the bus: each transaction sends the address, register and
+    repeated start address bytes besides the data, nine clocks per byte.
+    """
+    return (3 * transactions + nbytes) * 9 / bus_speed
+
+
+# Configuration the sensor is benchmarked in, continuous 1ms conversions
+_CONFIG = qwiic_opt4048.sfe_config_t(
+    range=REGS.opt4048RangeT.RANGE_AUTO,
+    conversion_time=REGS.opt4048ConversionTimeT.CONVERSION_TIME_1MS,
+    operation_mode=REGS.opt4048OperationModeT.OPERATION_MODE_CONTINUOUS,
+)
+
+# The APIs to measure, each called with the sensor
+APIS = {
+    "get_adc_ch0": lambda s: s.get_adc_ch0(),
+    "get_all_adc": lambda s: s.get_all_adc(),
+    "get_all_channel_data": lambda s: s.get_all_channel_data(
+        qwiic_opt4048.sfe_color_t()
+    ),
+    "measure": lambda s: s.measure(),
+    "measure+CIE+CCT": lambda s: s.measure().CCT,
+    "read_if_new": lambda s: s.read_if_new(),
+    "get_lux": lambda s: s.get_lux(),
+    "get_CIEx": lambda s: s.get_CIEx(),
+    "get_CIEy": lambda s: s.get_CIEy(),
+    "get_CCT": lambda s: s.get_CCT(),
+    "get_all_flags": lambda s: s.get_all_flags(),
+    "get_device_id": lambda s: s.get_device_id(),
+    "get_range": lambda s: s.get_range(),
+    "get_conversion_time": lambda s: s.get_conversion_time(),
+    "get_threshold_high": lambda s: s.get_threshold_high(),
+    "set_range": lambda s: s.set_range(REGS.opt4048RangeT.RANGE_AUTO.value),
+    "set_conversion_time": lambda s: s.set_conversion_time(
+        REGS.opt4048ConversionTimeT.CONVERSION_TIME_1MS.value
+    ),
+    "set_int_latch": lambda s: s.set_int_latch(True),
+    "set_basic_setup": lambda s: s.set_basic_setup(),
+    "apply_config": lambda s: s.apply_config(_CONFIG),
+}
+
+
+def bench_api(func, iterations, bus_speed, shadow_cache):
+    clock = opt4048_simulator.VirtualClock()
+    sim = opt4048_simulator.Opt4048Simulator(
+        light=(120000, 250000, 60000, 400000), clock=clock
+    )
+    driver = CountingDriver(sim)
+    sensor = qwiic_opt4048.QwOpt4048(i2c_driver=driver, shadow_cache=shadow_cache)
+    sensor.begin()
+    sensor.apply_config(_CONFIG)
+
+    # One full cycle of four 1ms conversions, so there is new data for every call
+    cycle = 4 * 0.001
+
+    # Measure traffic and time with the allocation tracer off, it slows every
+    # allocation down.
+    driver.reset()
+    wall = 0.0
+
+    for _ in range(iterations):
+        clock.advance(cycle)
+
+        start = time.perf_counter()
+        func(sensor)
+        wall += time.perf_counter() - start
+
+    moved = driver.bytes_read + driver.bytes_written
+    bus = bus_seconds(driver.transactions, moved, bus_speed)
+
+    result = {
+        "transactions": driver.transactions / iterations,
+        "reads": driver.reads / iterations,
+        "writes": driver.writes / iterations,
+        "bytes": moved / iterations,
+        "cpu_us": round(wall / iterations * 1e6, 2),
+        "bus_us": round(bus / iterations * 1e6, 2),
+        "total_us": round((wall + bus) / iterations * 1e6, 2),
+    }
+
+    # Peak memory allocated by a single call
+    peak = 0
+    tracemalloc.start()
+    for _ in range(min(iterations, 100)):
+        clock.advance(cycle)
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        func(sensor)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    result["alloc_peak_bytes"] = peak
+
+    return result
+
+
+def bench_read_into(iterations, bus_speed, shadow_cache):
+    buffer = opt4048_buffer.SampleRingBuffer(1024)
+    return bench_api(
+        lambda s: s.read_into(buffer), iterations, bus_speed, shadow_cache
+    )
+
+
+def run(iterations=1000, bus_speed=400000, shadow_cache=False, apis=None):
+    """
+    Benchmark the APIs and return the report as a dictionary.
+    """
+    results = {}
+
+    for name, func in APIS.items():
+        if apis is None or name in apis:
+            results[name] = bench_api(func, iterations, bus_speed, shadow_cache)
+
+    if apis is None or "read_into" in apis:
+        results["read_into"] = bench_read_into(iterations, bus_speed, shadow_cache)
+
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "iterations": iterations,
+        "bus_speed": bus_speed,
+        "shadow_cache": shadow_cache,
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure transactions, bytes, time and memory per QwOpt4048 API "
+        "call on a simulated device. cpu_us is the measured driver time, bus_us the "
+        "modeled time on the bus."
+    )
+    parser.add_argument("-n", "--iterations", type=int, default=1000)
+    parser.add_argument("--bus-speed", type=int, default=400000, help="I2C clock in Hz")
+    parser.add_argument("--shadow-cache", action="store_true")
+    parser.add_argument("--api", action="append", help="only run this API")
+    parser.add_argument("-o", "--output", help="write the JSON report to a file")
+    args = parser.parse_args(argv)
+
+    report = run(args.iterations, args.bus_speed, args.shadow_cache, args.api)
+    text = json.dumps(report, indent=2)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
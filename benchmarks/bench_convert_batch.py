@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -------------------------------------------------------------------------------
+# bench_convert_batch.py
+#
+# Compares the throughput of opt4048_batch.convert_batch() with the per-sample
+# color math of sfe_measurement_t.
+# -------------------------------------------------------------------------------
+# Written by SparkFun Electronics, November 2023
+#
+# This python library supports the SparkFun Electroncis Qwiic ecosystem
+#
+# More information on Qwiic is at https://www.sparkfun.com/qwiic
+# ===============================================================================
+# SPDX-License-Identifier: MIT
+#
+# Copyright (c) 2023 SparkFun Electronics
+# ===============================================================================
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+import qwiic_opt4048
+import opt4048_batch
+
+
+def bench_scalar(codes):
+    matrix = qwiic_opt4048.QwOpt4048.cie_matrix
+    start = time.perf_counter()
+
+    for row in codes.tolist():
+        m = qwiic_opt4048.sfe_measurement_t(codes=tuple(row), cie_matrix=matrix)
+        m.CIEx, m.CIEy, m.lux, m.CCT
+
+    return time.perf_counter() - start
+
+
+def bench_batch(codes):
+    start = time.perf_counter()
+
+    opt4048_batch.convert_batch(codes)
+
+    return time.perf_counter() - start
+
+
+def main(n=200000):
+    rng = np.random.default_rng(0)
+    codes = rng.integers(0, 1 << 20, size=(n, 4), dtype=np.int64)
+
+    scalar = bench_scalar(codes)
+    batch = bench_batch(codes)
+
+    print("samples:        %d" % n)
+    print("scalar:         %.0f samples/s" % (n / scalar))
+    print("convert_batch:  %.0f samples/s" % (n / batch))
+    print("speedup:        %.1fx" % (scalar / batch))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
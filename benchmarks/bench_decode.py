@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -------------------------------------------------------------------------------
+# bench_decode.py
+#
+# Compares decoding a 16-byte channel burst through the ctypes register unions
+# with qwiic_opt4048.decode_burst().
+# -------------------------------------------------------------------------------
+# Written by SparkFun Electronics, November 2023
+#
+# This python library supports the SparkFun Electroncis Qwiic ecosystem
+#
+# More information on Qwiic is at https://www.sparkfun.com/qwiic
+# ===============================================================================
+# SPDX-License-Identifier: MIT
+#
+# Copyright (c) 2023 SparkFun Electronics
+# ===============================================================================
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import qwiic_opt4048
+import opt4048_registers as REGS
+
+_EXP_RES_REGS = [
+    REGS.opt4048_reg_exp_res_ch0_t,
+    REGS.opt4048_reg_exp_res_ch1_t,
+    REGS.opt4048_reg_exp_res_ch2_t,
+    REGS.opt4048_reg_exp_res_ch3_t,
+]
+_RES_CNT_CRC_REGS = [
+    REGS.opt4048_reg_res_cnt_crc_ch0_t,
+    REGS.opt4048_reg_res_cnt_crc_ch1_t,
+    REGS.opt4048_reg_res_cnt_crc_ch2_t,
+    REGS.opt4048_reg_res_cnt_crc_ch3_t,
+]
+
+
+def decode_ctypes(buff):
+    """
+    Decode a burst the way the driver used to, through the register unions.
+    """
+    codes, exponents, counters, crcs = [], [], [], []
+
+    for ch in range(4):
+        msb = _EXP_RES_REGS[ch]()
+        lsb = _RES_CNT_CRC_REGS[ch]()
+
+        msb.word = (buff[4 * ch] << 8) | buff[4 * ch + 1]
+        lsb.word = (buff[4 * ch + 2] << 8) | buff[4 * ch + 3]
+
+        exponent = getattr(msb.bits, "exponent_ch%d" % ch)
+        mantissa = (getattr(msb.bits, "result_msb_ch%d" % ch) << 8) | getattr(
+            lsb.bits, "result_lsb_ch%d" % ch
+        )
+
+        codes.append(mantissa << exponent)
+        exponents.append(exponent)
+        counters.append(getattr(lsb.bits, "counter_ch%d" % ch))
+        crcs.append(getattr(lsb.bits, "crc_ch%d" % ch))
+
+    return codes, exponents, counters, crcs
+
+
+def main(n=100000):
+    random.seed(0)
+    buff = [random.randrange(256) for _ in range(16)]
+
+    old = list(decode_ctypes(buff))
+    new = qwiic_opt4048.decode_burst(buff)
+    assert old == [list(new[0]), list(new[1]), list(new[3]), list(new[4])]
+
+    t_ctypes = timeit.timeit(lambda: decode_ctypes(buff), number=n) / n
+    t_struct = timeit.timeit(lambda: qwiic_opt4048.decode_burst(buff), number=n) / n
+
+    print("ctypes unions:  %.2f us/sample" % (t_ctypes * 1e6))
+    print("decode_burst:   %.2f us/sample" % (t_struct * 1e6))
+    print("speedup:        %.1fx" % (t_ctypes / t_struct))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
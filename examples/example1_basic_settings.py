@@ -29,7 +29,6 @@
 
 import qwiic_opt4048 
 import sys
-import time
 
 
 def runExample():
@@ -56,11 +55,10 @@ def runExample():
 
     myColor.set_basic_setup()
 
-    while True:
-        print("CIEx: %f, CIEy: %f" % (myColor.get_CIEx(), myColor.get_CIEy()))
-        # Delay time is set to the conversion time * number of channels
-        # You need three channels for color sensing @ 200ms conversion time = 600ms.
-        time.sleep(0.6)
+    # stream() returns every new conversion of all four channels, one every
+    # 4 channels * 200ms conversion time = 800ms.
+    for color in myColor.stream():
+        print("CIEx: %f, CIEy: %f" % (color.CIEx, color.CIEy))
 
 
 if __name__ == "__main__":
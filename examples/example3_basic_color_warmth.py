@@ -27,7 +27,6 @@
 
 import qwiic_opt4048
 import sys
-import time
 
 
 def runExample():
@@ -54,11 +53,10 @@ def runExample():
 
     myColor.set_basic_setup()
 
-    while True:
-        print("Color Warmth: %fK" % myColor.get_CCT())
-        # Delay time is set to the conversion time * number of channels
-        # You need three channels for color sensing @ 200ms conversion time = 600ms.
-        time.sleep(0.6)
+    # stream() returns every new conversion of all four channels, one every
+    # 4 channels * 200ms conversion time = 800ms.
+    for color in myColor.stream():
+        print("Color Warmth: %fK" % color.CCT)
 
 
 if __name__ == "__main__":
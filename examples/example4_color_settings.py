@@ -27,7 +27,6 @@
 
 import qwiic_opt4048
 import sys
-import time
 import opt4048_registers as args
 
 
@@ -90,14 +89,10 @@ def runExample():
         args.opt4048OperationModeT.OPERATION_MODE_CONTINUOUS.value
     )
 
-    while True:
-        print(
-            "CIEx: %f, CIEy: %f, CCT: %fK"
-            % (myColor.get_CIEx(), myColor.get_CIEy(), myColor.get_CCT())
-        )
-        # Delay time is set to the conversion time * number of channels
-        # You need three channels for color sensing @ 800ms conversion time = 3200ms.
-        time.sleep(3.2)
+    # stream() returns every new conversion of all four channels, one every
+    # 4 channels * 800ms conversion time = 3200ms.
+    for color in myColor.stream():
+        print("CIEx: %f, CIEy: %f, CCT: %fK" % (color.CIEx, color.CIEy, color.CCT))
 
 
 if __name__ == "__main__":
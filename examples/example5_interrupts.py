@@ -27,14 +27,41 @@
 # ===============================================================================
 
 import qwiic_opt4048
+import opt4048_interrupt
+import argparse
+import queue
 import sys
-import time
 import opt4048_registers as args
 
+# Longest wait for a reading before checking on the background reader
+READING_TIMEOUT = 2.0
+
+
+def parseArguments():
+    parser = argparse.ArgumentParser(description="OPT4048 interrupt example")
+    parser.add_argument(
+        "--chip",
+        default="/dev/gpiochip0",
+        help="GPIO chip the INT pin of the sensor is connected to",
+    )
+    parser.add_argument(
+        "--line",
+        type=int,
+        help="GPIO line the INT pin is connected to. Without it, or without the "
+        "gpiod package, the sensor is polled instead.",
+    )
+    return parser.parse_args()
+
+
+def printColor(color):
+    print("CIEx: %f, CIEy: %f, CCT: %fK" % (color.CIEx, color.CIEy, color.CCT))
+
 
 def runExample():
     print("\nExample 5 - Interrupts\n")
 
+    options = parseArguments()
+
     # Create instance of device
     myColor = qwiic_opt4048.QwOpt4048()
 
@@ -60,7 +87,7 @@ def runExample():
 
     # Select the channel that will fire the interrupt
     # Lux values are generated in Channel One.
-    myColor.set_int_mechanism(args.opt4048IntCFGT.INT_DR_ALL_CHANNELS)
+    myColor.set_int_mechanism(args.opt4048IntCFGT.INT_DR_ALL_CHANNELS.value)
 
     # Change the interrupt direction to active LOW, HIGH is default
     # myColor.set_int_active_high(False)
@@ -69,14 +96,47 @@ def runExample():
     # set operation mode to one shot mode in this case.
     # myColor.set_int_input()
 
-    while True:
-        print(
-            "CIEx: %f, CIEy: %f, CCT: %fK"
-            % (myColor.get_CIEx(), myColor.get_CIEy(), myColor.get_CCT())
-        )
-        # Delay time is set to the conversion time * number of channels
-        # You need three channels for color sensing @ 200ms conversion time = 600ms.
-        time.sleep(0.6)
+    source = None
+
+    if options.line is not None:
+        try:
+            source = opt4048_interrupt.GpioChipEdgeSource(
+                options.chip, options.line, active_high=True
+            )
+        except (ImportError, OSError) as err:
+            print("Can't watch the INT pin (%s), polling instead." % err)
+
+    if source is None:
+        # Without the INT pin, poll for each new conversion
+        for color in myColor.stream():
+            printColor(color)
+        return
+
+    # Instead of sleeping, wait for the INT pin to signal that new data is ready.
+    # Each edge wakes a background reader that reads all channels at once.
+    readings = queue.Queue()
+
+    try:
+        with opt4048_interrupt.InterruptReader(
+            myColor, source, queue=readings
+        ) as reader:
+            while True:
+                try:
+                    color = readings.get(timeout=READING_TIMEOUT)
+                except queue.Empty:
+                    if reader.error is not None:
+                        print("Reading failed: %s" % reader.error, file=sys.stderr)
+                        return
+
+                    print(
+                        "No interrupt yet, is the INT pin on line %d of %s?"
+                        % (options.line, options.chip)
+                    )
+                    continue
+
+                printColor(color)
+    finally:
+        source.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,177 @@
+# -------------------------------------------------------------------------------
+# opt4048_array.py
+#
+# Multi-sensor support for the SparkFun Qwiic OPT4048 Tristiumulus Color Sensor.
+# -------------------------------------------------------------------------------
+# Written by SparkFun Electronics, November, 2023 This python library supports the SparkFun Electroncis Qwiic ecosystem
+# More information on Qwiic is at https://www.sparkfun.com/qwiic
+#
+# ===============================================================================
+# Copyright (c) 2023 SparkFun Electronics
+# SPDX-License-Identifier: MIT
+# ===============================================================================
+
+"""
+Manage several OPT4048 sensors spread over one or more I2C buses.
+
+Each bus gets its own worker thread. Sensors on the same bus are read one
+after another, and different buses are read in parallel, so capturing a frame
+takes about as long as the busiest bus.
+"""
+
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import qwiic_opt4048
+
+
+@dataclass
+class sfe_frame_t:
+    """
+    One reading from every sensor of a SensorArray, stored column by column.
+    Entry i of each column belongs to the same sensor, and codes and counters
+    hold four consecutive entries (channels 0 - 3) per sensor.
+    """
+
+    bus: array = field(default_factory=lambda: array("B"))
+    address: array = field(default_factory=lambda: array("B"))
+    codes: array = field(default_factory=lambda: array("Q"))
+    counters: array = field(default_factory=lambda: array("B"))
+    valid: array = field(default_factory=lambda: array("B"))
+    timestamp: array = field(default_factory=lambda: array("d"))
+
+    def __len__(self):
+        return len(self.address)
+
+    def channel_codes(self, index):
+        """
+        Return the four ADC codes of one sensor in the frame.
+
+        :param index: Position of the sensor in the frame.
+        :type index: int
+        :return: ADC codes of channels 0 - 3.
+        :rtype: tuple
+        """
+        return tuple(self.codes[4 * index : 4 * index + 4])
+
+
+class SensorArray:
+    """
+    SensorArray
+    """
+
+    def __init__(self, buses, shadow_cache=True):
+        """
+        Initialize the SensorArray class.
+        :param buses: The i2c driver objects of the buses to use.
+        :type buses: list
+        :param shadow_cache: Enable the shadow cache of each sensor, see QwOpt4048.
+        :type shadow_cache: bool
+        :return: The SensorArray object.
+        :rtype: Object
+        """
+        self.buses = list(buses)
+        self.shadow_cache = shadow_cache
+
+        # Sensors found on each bus, indexed like self.buses
+        self.sensors = [[] for _ in self.buses]
+
+        self._executor = ThreadPoolExecutor(max_workers=max(len(self.buses), 1))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Stop the bus worker threads.
+
+        :return: None
+        """
+        self._executor.shutdown()
+
+    def __len__(self):
+        return sum(len(sensors) for sensors in self.sensors)
+
+    def _map(self, func):
+        """
+        Call func(bus_index) for every bus in parallel and return the results in bus
+        order.
+        """
+        return list(self._executor.map(func, range(len(self.buses))))
+
+    def _discover_bus(self, bus_index, addresses):
+        bus = self.buses[bus_index]
+        found = []
+
+        for address in addresses:
+            if hasattr(bus, "isDeviceConnected") and not bus.isDeviceConnected(
+                address
+            ):
+                continue
+
+            sensor = qwiic_opt4048.QwOpt4048(address, bus, self.shadow_cache)
+
+            try:
+                if sensor.begin():
+                    found.append(sensor)
+            except OSError:
+                # Nothing answering at this address
+                pass
+
+        return found
+
+    def discover(self, addresses=qwiic_opt4048.QwOpt4048.available_addresses):
+        """
+        Look for sensors at each of the given addresses on every bus.
+
+        :param addresses: I2C addresses to probe.
+        :type addresses: list
+        :return: Number of sensors found.
+        :rtype: int
+        """
+        self.sensors = self._map(lambda i: self._discover_bus(i, addresses))
+
+        return len(self)
+
+    def apply_config(self, config):
+        """
+        Apply the same configuration to every sensor, see QwOpt4048.apply_config().
+
+        :param config: The configuration changes to apply.
+        :type config: sfe_config_t
+        :return: None
+        """
+
+        def configure_bus(bus_index):
+            for sensor in self.sensors[bus_index]:
+                sensor.apply_config(config)
+
+        self._map(configure_bus)
+
+    def capture(self):
+        """
+        Read one measurement from every sensor.
+
+        :return: The frame.
+        :rtype: sfe_frame_t
+        """
+
+        def read_bus(bus_index):
+            return [sensor.measure() for sensor in self.sensors[bus_index]]
+
+        frame = sfe_frame_t()
+
+        for bus_index, measurements in enumerate(self._map(read_bus)):
+            for sensor, measurement in zip(self.sensors[bus_index], measurements):
+                frame.bus.append(bus_index)
+                frame.address.append(sensor.address)
+                frame.codes.extend(measurement.codes)
+                frame.counters.extend(measurement.counters)
+                frame.valid.append(measurement.valid)
+                frame.timestamp.append(measurement.timestamp)
+
+        return frame
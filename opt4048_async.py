@@ -0,0 +1,181 @@
+# -------------------------------------------------------------------------------
+# opt4048_async.py
+#
+# asyncio support for the SparkFun Qwiic OPT4048 Tristiumulus Color Sensor.
+# -------------------------------------------------------------------------------
+# Written by SparkFun Electronics, November, 2023 This python library supports the SparkFun Electroncis Qwiic ecosystem
+# More information on Qwiic is at https://www.sparkfun.com/qwiic
+#
+# ===============================================================================
+# Copyright (c) 2023 SparkFun Electronics
+# SPDX-License-Identifier: MIT
+# ===============================================================================
+
+"""
+asyncio driver for the OPT4048.
+
+AsyncQwOpt4048 wraps a QwOpt4048. Bus transactions run in the event loop's
+executor, one at a time per I2C bus, and waits between conversions use
+asyncio.sleep(), so a single event loop can drive many sensors.
+"""
+
+import asyncio
+import contextlib
+import functools
+import weakref
+
+import qwiic_opt4048
+
+# One lock per event loop and I2C bus object, shared by every sensor on that
+# bus. An asyncio.Lock belongs to the loop it is first used in, and neither the
+# loops nor the buses are kept alive by the table.
+_bus_locks = weakref.WeakKeyDictionary()
+
+
+def _bus_lock(bus):
+    """
+    Return the asyncio lock that serializes transactions on an I2C bus in the
+    running event loop.
+    """
+    locks = _bus_locks.setdefault(
+        asyncio.get_running_loop(), weakref.WeakKeyDictionary()
+    )
+
+    lock = locks.get(bus)
+    if lock is None:
+        lock = locks[bus] = asyncio.Lock()
+
+    return lock
+
+
+class AsyncQwOpt4048:
+    """
+    AsyncQwOpt4048
+    """
+
+    def __init__(self, address=None, i2c_driver=None, shadow_cache=False, sensor=None):
+        """
+        Initialize the AsyncQwOpt4048 device class.
+        :param address: The I2C address to use for the device.
+        :param i2c_driver: An existing i2c driver object to use (optional).
+        :param shadow_cache: Keep a local copy of the configuration registers, see
+            QwOpt4048 (optional).
+        :param sensor: An existing QwOpt4048 to wrap instead of creating one
+            (optional).
+        :return: The AsyncQwOpt4048 device object.
+        :rtype: Object
+        """
+        if sensor is None:
+            sensor = qwiic_opt4048.QwOpt4048(address, i2c_driver, shadow_cache)
+
+        self.sensor = sensor
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Run a blocking call, normally a method of self.sensor, in the executor while
+        holding the bus lock.
+
+        :param func: The function to call.
+        :return: The return value of func.
+        """
+        loop = asyncio.get_running_loop()
+
+        async with _bus_lock(self.sensor._i2c):
+            return await loop.run_in_executor(
+                None, functools.partial(func, *args, **kwargs)
+            )
+
+    async def begin(self):
+        """
+        Initializes this device with default parameters
+
+        :return: Returns `True` if successful, otherwise `False`
+        :rtype: bool
+        """
+        return await self.run(self.sensor.begin)
+
+    async def measure(self):
+        """
+        Read all four channels with a single burst.
+
+        :return: The measurement.
+        :rtype: sfe_measurement_t
+        """
+        return await self.run(self.sensor.measure)
+
+    async def apply_config(self, config):
+        """
+        Apply a configuration with at most one burst write, see
+        QwOpt4048.apply_config().
+
+        :param config: The configuration changes to apply.
+        :type config: sfe_config_t
+        :return: True if the device was written, otherwise False.
+        :rtype: bool
+        """
+        return await self.run(self.sensor.apply_config, config)
+
+    @contextlib.asynccontextmanager
+    async def configure(self):
+        """
+        Collect configuration changes and apply them together on exit, e.g.::
+
+            async with sensor.configure() as cfg:
+                cfg.conversion_time = opt4048ConversionTimeT.CONVERSION_TIME_1MS
+
+        :return: A configuration object to fill in.
+        :rtype: sfe_config_t
+        """
+        config = qwiic_opt4048.sfe_config_t()
+
+        yield config
+
+        await self.apply_config(config)
+
+    async def stream(self, count=None, timeout=None):
+        """
+        Generate measurements as fast as the device produces them in continuous mode,
+        see QwOpt4048.stream(). The event loop is free between reads.
+
+        :param count: Number of measurements to generate, None for no limit.
+        :type count: int
+        :param timeout: End the stream if no new conversion arrives for this many
+            seconds, None to wait forever.
+        :type timeout: float
+        :return: Asynchronous generator of measurements.
+        :rtype: sfe_measurement_t
+        """
+        loop = asyncio.get_running_loop()
+
+        period = await self.run(self.sensor.get_frame_period)
+        backoff = period / 16
+        deadline = loop.time() + period
+        last = loop.time()
+        early = False
+        n = 0
+
+        while count is None or n < count:
+            delay = deadline - loop.time()
+
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            before = loop.time()
+            measurement = await self.run(self.sensor.read_if_new)
+
+            if measurement is None:
+                if timeout is not None and before - last >= timeout:
+                    return
+
+                deadline = before + backoff
+                early = True
+                continue
+
+            last = before
+
+            deadline = (before if early else deadline) + period - backoff / 2
+            early = False
+
+            yield measurement
+
+            n += 1
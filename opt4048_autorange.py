@@ -0,0 +1,241 @@
+# -------------------------------------------------------------------------------
+# opt4048_autorange.py
+#
+# Software range and conversion time control for the SparkFun Qwiic OPT4048 Tristiumulus Color Sensor.
+# -------------------------------------------------------------------------------
+# Written by SparkFun Electronics, November, 2023 This python library supports the SparkFun Electroncis Qwiic ecosystem
+# More information on Qwiic is at https://www.sparkfun.com/qwiic
+#
+# ===============================================================================
+# Copyright (c) 2023 SparkFun Electronics
+# SPDX-License-Identifier: MIT
+# ===============================================================================
+
+"""
+Pick the range and conversion time from the light actually seen.
+
+AutoRangeController watches the measurements of a sensor running in
+continuous mode:
+
+* Range: the smallest manual range whose full scale keeps the brightest
+  channel below a headroom fraction. A nearly full mantissa, or the overload
+  flag if enabled, moves the range up straight away. Moving down needs more
+  margin so the range doesn't flip back and forth.
+* Conversion time: the sample-to-sample noise of one channel is estimated over
+  a window of samples. Since the noise falls with the square root of the
+  conversion time, the shortest conversion time that is predicted to meet the
+  precision target can be chosen directly.
+
+Both settings change together through QwOpt4048.apply_config(), which is a
+single register write with the shadow cache enabled, and only when one of them
+has to change. Bright, steady light ends up at short conversion times and high
+sample rates, dim or noisy light at long ones.
+"""
+
+import math
+
+import qwiic_opt4048
+import opt4048_registers as REGS
+
+# Largest manual range, RANGE_144LUX
+_MAX_RANGE = REGS.opt4048RangeT.RANGE_144LUX.value
+
+# Mantissas above this are treated as clipped
+_CLIP_MANTISSA = 0xF0000
+
+# A shorter conversion time or lower range is only chosen if it beats the target
+# by this factor
+_HYSTERESIS = 0.7
+
+
+class AutoRangeController:
+    """
+    AutoRangeController
+    """
+
+    def __init__(
+        self,
+        sensor,
+        precision=0.005,
+        channel=1,
+        headroom=0.8,
+        window=8,
+        min_conversion_time=REGS.opt4048ConversionTimeT.CONVERSION_TIME_600US,
+        max_conversion_time=REGS.opt4048ConversionTimeT.CONVERSION_TIME_800MS,
+        check_overload=False,
+    ):
+        """
+        Initialize the AutoRangeController class. The sensor should run in
+        continuous mode, ideally with the shadow cache enabled.
+        :param sensor: The sensor to control.
+        :type sensor: QwOpt4048
+        :param precision: Target relative noise (standard deviation / mean) of the
+            channel.
+        :type precision: float
+        :param channel: Channel whose noise is controlled, 1 (Y) by default.
+        :type channel: int
+        :param headroom: Fraction of the full scale the brightest channel may use.
+        :type headroom: float
+        :param window: Samples used to estimate the noise.
+        :type window: int
+        :param min_conversion_time: Shortest conversion time to use.
+        :type min_conversion_time: opt4048ConversionTimeT
+        :param max_conversion_time: Longest conversion time to use.
+        :type max_conversion_time: opt4048ConversionTimeT
+        :param check_overload: Also read the overload flag after each measurement.
+            This costs a 2-byte read and clears the latched flags.
+        :type check_overload: bool
+        :return: The AutoRangeController object.
+        :rtype: Object
+        """
+        self.sensor = sensor
+        self.precision = precision
+        self.channel = channel
+        self.headroom = headroom
+        self.window = window
+        self.min_conversion_time = qwiic_opt4048._enum_value(min_conversion_time)
+        self.max_conversion_time = qwiic_opt4048._enum_value(max_conversion_time)
+        self.check_overload = check_overload
+
+        self.color_range = sensor.get_range()
+        self.conversion_time = sensor.get_conversion_time()
+
+        # Latest relative noise estimate, None until the window has filled
+        self.noise = None
+        # Number of times the settings were changed
+        self.changes = 0
+
+        self._samples = []
+        self._settled = 0.0
+
+    def _full_scale(self, color_range):
+        return 0xFFFFF << color_range
+
+    def _choose_range(self, peak, clipped):
+        """
+        Pick the range for the brightest channel code.
+        """
+        current = self.color_range
+
+        if current == REGS.opt4048RangeT.RANGE_AUTO.value:
+            current = _MAX_RANGE
+
+        if clipped:
+            return min(current + 1, _MAX_RANGE)
+
+        for color_range in range(_MAX_RANGE + 1):
+            if peak <= self.headroom * self._full_scale(color_range):
+                break
+
+        if color_range < current:
+            # Only go down with extra margin
+            for lower in range(color_range, current):
+                if peak <= _HYSTERESIS * self.headroom * self._full_scale(lower):
+                    return lower
+            return current
+
+        return color_range
+
+    def _choose_conversion_time(self, noise):
+        """
+        Pick the shortest conversion time predicted to meet the precision target.
+        """
+        seconds = qwiic_opt4048._CONVERSION_TIME_SECONDS
+        current = seconds[self.conversion_time]
+
+        for index in range(self.min_conversion_time, self.max_conversion_time + 1):
+            predicted = noise * math.sqrt(current / seconds[index])
+            target = self.precision
+
+            if index < self.conversion_time:
+                target *= _HYSTERESIS
+
+            if predicted <= target:
+                return index
+
+        return self.max_conversion_time
+
+    def _estimate_noise(self):
+        """
+        Relative noise of the window from successive differences, which ignores
+        slow drifts of the light level.
+        """
+        samples = self._samples
+        mean = sum(samples) / len(samples)
+
+        if mean <= 0:
+            return math.inf
+
+        squares = sum((b - a) ** 2 for a, b in zip(samples, samples[1:]))
+
+        return math.sqrt(squares / (2 * (len(samples) - 1))) / mean
+
+    def update(self, measurement):
+        """
+        Take a measurement into account and reconfigure the sensor if needed.
+
+        :param measurement: The latest measurement of the sensor.
+        :type measurement: sfe_measurement_t
+        :return: True if the settings were changed, otherwise False.
+        :rtype: bool
+        """
+        # Samples still converted with the old settings
+        if measurement.timestamp < self._settled:
+            return False
+
+        mantissas = [
+            code >> exponent
+            for code, exponent in zip(measurement.codes, measurement.exponents)
+        ]
+        clipped = max(mantissas) >= _CLIP_MANTISSA
+
+        if self.check_overload and self.sensor.get_overload_flag():
+            clipped = True
+
+        color_range = self._choose_range(max(measurement.codes), clipped)
+        conversion_time = self.conversion_time
+
+        self._samples.append(measurement.codes[self.channel])
+
+        if len(self._samples) >= self.window:
+            self.noise = self._estimate_noise()
+            conversion_time = self._choose_conversion_time(self.noise)
+            del self._samples[0]
+
+        if (
+            color_range == self.color_range
+            and conversion_time == self.conversion_time
+        ):
+            return False
+
+        self.sensor.apply_config(
+            qwiic_opt4048.sfe_config_t(
+                range=color_range, conversion_time=conversion_time
+            )
+        )
+
+        self.color_range = color_range
+        self.conversion_time = conversion_time
+        self.changes += 1
+
+        # Start over with samples taken entirely with the new settings
+        self._samples = []
+        self._settled = measurement.timestamp + self.sensor.get_frame_period()
+
+        return True
+
+    def measure(self, timeout=None):
+        """
+        Wait for the next measurement, then update the settings with it.
+
+        :param timeout: Maximum time to wait in seconds, None to wait forever.
+        :type timeout: float
+        :return: The measurement, or None on timeout.
+        :rtype: sfe_measurement_t
+        """
+        measurement = self.sensor.read_next(timeout)
+
+        if measurement is not None:
+            self.update(measurement)
+
+        return measurement
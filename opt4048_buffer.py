@@ -0,0 +1,176 @@
+# -------------------------------------------------------------------------------
+# opt4048_buffer.py
+#
+# Preallocated sample storage for the SparkFun Qwiic OPT4048 Tristiumulus Color Sensor.
+# -------------------------------------------------------------------------------
+# Written by SparkFun Electronics, November, 2023 This python library supports the SparkFun Electroncis Qwiic ecosystem
+# More information on Qwiic is at https://www.sparkfun.com/qwiic
+#
+# ===============================================================================
+# Copyright (c) 2023 SparkFun Electronics
+# SPDX-License-Identifier: MIT
+# ===============================================================================
+
+"""
+Fixed-capacity ring buffer of raw OPT4048 samples.
+
+All storage is allocated up front as array columns, and QwOpt4048.read_into()
+decodes each burst straight into the next slot, so acquisition doesn't create
+a measurement object per sample. Per-channel columns (codes, exponents,
+counters, crcs) hold four consecutive entries per sample.
+"""
+
+from array import array
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Columns with one entry per channel and with one entry per sample
+_CHANNEL_COLUMNS = ("codes", "exponents", "counters", "crcs")
+_SAMPLE_COLUMNS = ("timestamps", "valid")
+
+
+class SampleRingBuffer:
+    """
+    SampleRingBuffer
+    """
+
+    def __init__(self, capacity, overwrite=True):
+        """
+        Initialize the SampleRingBuffer class.
+        :param capacity: Maximum number of samples held.
+        :type capacity: int
+        :param overwrite: When full, overwrite the oldest sample if True, otherwise
+            block the writer until samples are consumed.
+        :type overwrite: bool
+        :return: The SampleRingBuffer object.
+        :rtype: Object
+        """
+        self.capacity = capacity
+        self.overwrite = overwrite
+
+        self.codes = array("Q", bytes(8 * 4 * capacity))
+        self.exponents = array("B", bytes(4 * capacity))
+        self.counters = array("B", bytes(4 * capacity))
+        self.crcs = array("B", bytes(4 * capacity))
+        self.timestamps = array("d", bytes(8 * capacity))
+        self.valid = array("B", bytes(capacity))
+
+        # Samples dropped because the buffer was full in overwrite mode
+        self.overruns = 0
+
+        self._head = 0
+        self._count = 0
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return self._count
+
+    def reserve(self, timeout=None):
+        """
+        Claim the slot for the next sample. In blocking mode this waits for space if
+        the buffer is full. The sample becomes visible once commit() is called.
+
+        :param timeout: Maximum time to wait for space in seconds.
+        :type timeout: float
+        :return: The slot index, or None if no space became available in time.
+        :rtype: int
+        """
+        with self._cond:
+            if self._count == self.capacity:
+                if self.overwrite:
+                    self._count -= 1
+                    self.overruns += 1
+                elif not self._cond.wait_for(
+                    lambda: self._count < self.capacity, timeout
+                ):
+                    return None
+
+            return self._head
+
+    def commit(self):
+        """
+        Publish the sample written to the slot returned by reserve().
+
+        :return: None
+        """
+        with self._cond:
+            self._head = (self._head + 1) % self.capacity
+            self._count += 1
+            self._cond.notify_all()
+
+    def consume(self, n=None):
+        """
+        Drop the oldest samples, making room for new ones in blocking mode.
+
+        :param n: Number of samples to drop, all of them if None.
+        :type n: int
+        :return: None
+        """
+        with self._cond:
+            self._count -= self._count if n is None else min(n, self._count)
+            self._cond.notify_all()
+
+    def clear(self):
+        """
+        Drop all samples.
+
+        :return: None
+        """
+        self.consume()
+
+    def _range(self, n):
+        """
+        Return the first slot and number of slots of the last n samples.
+        """
+        with self._cond:
+            n = self._count if n is None else min(n, self._count)
+            return (self._head - n) % self.capacity, n
+
+    def last(self, n=None):
+        """
+        Return the columns of the last n samples, oldest first. With NumPy the
+        columns are NumPy arrays that share memory with the buffer unless the
+        samples wrap around its end, and the per-channel columns have the shape
+        (n, 4). Without NumPy they are array copies with four consecutive entries
+        per sample.
+
+        :param n: Number of samples, all of them if None.
+        :type n: int
+        :return: Column name to column values.
+        :rtype: dict
+        """
+        start, n = self._range(n)
+        end = start + n
+        columns = {}
+
+        for name in _CHANNEL_COLUMNS + _SAMPLE_COLUMNS:
+            column = getattr(self, name)
+            width = 4 if name in _CHANNEL_COLUMNS else 1
+
+            if np is not None:
+                values = np.frombuffer(column, dtype=column.typecode)
+                if end <= self.capacity:
+                    values = values[start * width : end * width]
+                else:
+                    values = np.concatenate(
+                        (
+                            values[start * width :],
+                            values[: (end - self.capacity) * width],
+                        )
+                    )
+                if width == 4:
+                    values = values.reshape(n, 4)
+            elif end <= self.capacity:
+                values = column[start * width : end * width]
+            else:
+                values = (
+                    column[start * width :] + column[: (end - self.capacity) * width]
+                )
+
+            columns[name] = values
+
+        return columns
@@ -0,0 +1,392 @@
+# -------------------------------------------------------------------------------
+# opt4048_capture.py
+#
+# Binary capture files for the SparkFun Qwiic OPT4048 Tristiumulus Color Sensor.
+# -------------------------------------------------------------------------------
+# Written by SparkFun Electronics, November, 2023 This python library supports the SparkFun Electroncis Qwiic ecosystem
+# More information on Qwiic is at https://www.sparkfun.com/qwiic
+#
+# ===============================================================================
+# Copyright (c) 2023 SparkFun Electronics
+# SPDX-License-Identifier: MIT
+# ===============================================================================
+
+"""
+Compact fixed-record log files of raw OPT4048 samples.
+
+A capture file is a header followed by fixed 24-byte records, each a
+little-endian double timestamp (time.monotonic() seconds) and the 16 bytes of
+the channel result registers exactly as read from the device. The header, all
+little-endian, holds:
+
+* the magic b"OPT4048C", the format version, header size and record size,
+* the device ID,
+* the raw registers 0x08 - 0x0B (thresholds, CONTROL and INT_CONTROL),
+* the offset from the record timestamps to time.time(),
+* the 4x4 CIE conversion matrix as doubles.
+
+CaptureWriter appends records in bulk and doesn't need NumPy. CaptureReader
+maps the file into memory, so opening it is instant whatever its size, and
+exposes the records as NumPy views. Decoding and color conversion only happen
+for the samples asked for, through opt4048_batch.convert_batch().
+"""
+
+import mmap
+import os
+import struct
+import time
+
+import qwiic_opt4048
+import opt4048_cct
+
+try:
+    import numpy as np
+    import opt4048_batch
+except ImportError:
+    np = None
+
+_MAGIC = b"OPT4048C"
+_VERSION = 1
+
+# magic, version, header size, record size, device id, registers 0x08 - 0x0B,
+# clock offset, CIE matrix
+_HEADER = struct.Struct("<8sHHHH4Hd16d")
+_HEADER_SIZE = 256
+
+_RECORD = struct.Struct("<d16s")
+
+if np is not None:
+    RECORD_DTYPE = np.dtype([("timestamp", "<f8"), ("raw", "u1", 16)])
+
+
+def encode_burst(exponents, mantissas, counters, crcs):
+    """
+    Build the 16 bytes of the channel result registers, the inverse of
+    qwiic_opt4048.decode_burst().
+
+    :param exponents: Exponents of channels 0 - 3.
+    :param mantissas: Mantissas of channels 0 - 3.
+    :param counters: Sample counters of channels 0 - 3.
+    :param crcs: CRCs of channels 0 - 3.
+    :return: The register bytes.
+    :rtype: bytes
+    """
+    words = []
+
+    for e, m, c, crc in zip(exponents, mantissas, counters, crcs):
+        words.append((e << 12) | (m >> 8))
+        words.append(((m & 0xFF) << 8) | (c << 4) | crc)
+
+    return struct.pack(">8H", *words)
+
+
+class CaptureWriter:
+    """
+    CaptureWriter
+    """
+
+    def __init__(
+        self,
+        path,
+        sensor=None,
+        cie_matrix=None,
+        registers=(0, 0, 0, 0),
+        device_id=qwiic_opt4048.OPT4048_DEVICE_ID,
+        batch=256,
+    ):
+        """
+        Initialize the CaptureWriter class. An existing capture file is appended to
+        and keeps its header.
+        :param path: Path of the capture file.
+        :type path: str
+        :param sensor: Take the device ID, configuration registers and CIE matrix
+            from this sensor (optional).
+        :type sensor: QwOpt4048
+        :param cie_matrix: CIE conversion matrix, QwOpt4048.cie_matrix if None.
+        :type cie_matrix: list
+        :param registers: Raw values of registers 0x08 - 0x0B.
+        :type registers: tuple
+        :param device_id: The device ID.
+        :type device_id: int
+        :param batch: Number of records buffered before they are written.
+        :type batch: int
+        :return: The CaptureWriter object.
+        :rtype: Object
+        """
+        self.path = path
+        self.batch = batch
+        self._pending = bytearray()
+        self._count = 0
+
+        if os.path.exists(path) and os.path.getsize(path) >= _HEADER_SIZE:
+            with open(path, "rb") as f:
+                _read_header(f.read(_HEADER_SIZE))
+
+            self._file = open(path, "r+b")
+
+            # Drop a partial record left by an interrupted writer
+            size = os.path.getsize(path) - _HEADER_SIZE
+            self._file.truncate(_HEADER_SIZE + size - size % _RECORD.size)
+            self._file.seek(0, os.SEEK_END)
+            return
+
+        if sensor is not None:
+            device_id = sensor.get_device_id()
+            registers = sensor.get_config_registers()
+            cie_matrix = sensor.cie_matrix
+
+        if cie_matrix is None:
+            cie_matrix = qwiic_opt4048.QwOpt4048.cie_matrix
+
+        header = _HEADER.pack(
+            _MAGIC,
+            _VERSION,
+            _HEADER_SIZE,
+            _RECORD.size,
+            device_id,
+            *registers,
+            time.time() - time.monotonic(),
+            *[value for row in cie_matrix for value in row],
+        )
+
+        self._file = open(path, "wb")
+        self._file.write(header.ljust(_HEADER_SIZE, b"\0"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, timestamp, raw):
+        """
+        Add one sample.
+
+        :param timestamp: time.monotonic() of the sample.
+        :type timestamp: float
+        :param raw: The 16 bytes read from the channel result registers.
+        :return: None
+        """
+        self._pending += _RECORD.pack(timestamp, bytes(raw))
+        self._count += 1
+
+        if self._count >= self.batch:
+            self.flush()
+
+    def append_measurement(self, measurement):
+        """
+        Add a measurement, stored as the register bytes it was decoded from.
+
+        :param measurement: The measurement.
+        :type measurement: sfe_measurement_t
+        :return: None
+        """
+        mantissas = [
+            code >> exponent
+            for code, exponent in zip(measurement.codes, measurement.exponents)
+        ]
+
+        self.append(
+            measurement.timestamp,
+            encode_burst(
+                measurement.exponents, mantissas, measurement.counters, measurement.crcs
+            ),
+        )
+
+    def extend(self, timestamps, raws):
+        """
+        Add many samples with a single write.
+
+        :param timestamps: time.monotonic() of each sample.
+        :param raws: The 16 register bytes of each sample.
+        :return: None
+        """
+        for timestamp, raw in zip(timestamps, raws):
+            self._pending += _RECORD.pack(timestamp, bytes(raw))
+            self._count += 1
+
+        self.flush()
+
+    def flush(self):
+        """
+        Write the buffered samples to the file.
+
+        :return: None
+        """
+        if self._pending:
+            self._file.write(self._pending)
+            self._pending = bytearray()
+            self._count = 0
+
+        self._file.flush()
+
+    def close(self):
+        """
+        Write the buffered samples and close the file.
+
+        :return: None
+        """
+        self.flush()
+        self._file.close()
+
+
+def _read_header(data):
+    """
+    Check and unpack a capture file header.
+    """
+    if len(data) < _HEADER.size or data[: len(_MAGIC)] != _MAGIC:
+        raise ValueError("Not an OPT4048 capture file")
+
+    fields = _HEADER.unpack_from(data)
+
+    if fields[1] != _VERSION or fields[3] != _RECORD.size:
+        raise ValueError("Unsupported OPT4048 capture file version %d" % fields[1])
+
+    return fields
+
+
+class CaptureReader:
+    """
+    CaptureReader
+    """
+
+    def __init__(self, path):
+        """
+        Initialize the CaptureReader class, requires NumPy.
+        :param path: Path of the capture file.
+        :type path: str
+        :return: The CaptureReader object.
+        :rtype: Object
+        """
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        fields = _read_header(self._map[:_HEADER_SIZE])
+        header_size = fields[2]
+
+        self.device_id = fields[4]
+        # Raw THRESH_L, THRESH_H, CONTROL and INT_CONTROL registers
+        self.registers = dict(
+            zip(qwiic_opt4048.QwOpt4048.SHADOW_REGISTERS, fields[5:9])
+        )
+        self.clock_offset = fields[9]
+        self.cie_matrix = [list(fields[10 + 4 * i : 14 + 4 * i]) for i in range(4)]
+
+        count = (len(self._map) - header_size) // _RECORD.size
+        self.records = np.frombuffer(
+            self._map, dtype=RECORD_DTYPE, count=count, offset=header_size
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Unmap and close the file. Views of the records must not be used afterwards.
+
+        :return: None
+        """
+        # Drop our own view first, mmap refuses to close with exports alive
+        self.records = None
+        self._map.close()
+        self._file.close()
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def timestamps(self):
+        """
+        time.monotonic() of each sample, a view of the file.
+        """
+        return self.records["timestamp"]
+
+    @property
+    def raw(self):
+        """
+        The register bytes of each sample, a (N, 16) view of the file.
+        """
+        return self.records["raw"]
+
+    @property
+    def config(self):
+        """
+        The configuration the capture was taken with.
+        """
+        config = qwiic_opt4048.sfe_config_t()
+
+        for name, (register, mask, shift) in qwiic_opt4048._CONFIG_FIELDS.items():
+            setattr(config, name, (self.registers[register] & mask) >> shift)
+
+        return config
+
+    def decode(self, start=None, stop=None):
+        """
+        Decode a range of samples.
+
+        :param start: First sample.
+        :type start: int
+        :param stop: End of the range (exclusive).
+        :type stop: int
+        :return: ADC codes, exponents, counters and CRCs, each of shape (n, 4).
+        :rtype: tuple
+        """
+        words = self.raw[start:stop].view(">u2").astype(np.uint32)
+        msb = words[:, 0::2]
+        lsb = words[:, 1::2]
+
+        exponents = msb >> 12
+        mantissas = ((msb & 0x0FFF) << 8) | (lsb >> 8)
+        codes = mantissas.astype(np.uint64) << exponents.astype(np.uint64)
+
+        return codes, exponents, (lsb >> 4) & 0x0F, lsb & 0x0F
+
+    def valid(self, start=None, stop=None):
+        """
+        Check the CRCs of a range of samples.
+
+        :param start: First sample.
+        :type start: int
+        :param stop: End of the range (exclusive).
+        :type stop: int
+        :return: True for each sample whose four CRCs match.
+        :rtype: numpy.ndarray
+        """
+        codes, exponents, counters, crcs = self.decode(start, stop)
+        mantissas = codes >> exponents.astype(np.uint64)
+        word = (
+            (exponents.astype(np.uint64) << 24) | (mantissas << 4) | counters
+        ).astype(np.uint32)
+
+        t0, t1, t2, t3 = (
+            np.array(table, dtype=np.uint8) for table in qwiic_opt4048._CRC_TABLES
+        )
+        crc = (
+            t0[word & 0xFF]
+            ^ t1[(word >> 8) & 0xFF]
+            ^ t2[(word >> 16) & 0xFF]
+            ^ t3[(word >> 24) & 0x0F]
+        )
+
+        return (crc == crcs).all(axis=1)
+
+    def convert(self, start=None, stop=None, cct_algorithm=opt4048_cct.CCT_MCCAMY):
+        """
+        Convert a range of samples to XYZ, CIE x/y, lux and CCT with the CIE matrix
+        stored in the file.
+
+        :param start: First sample.
+        :type start: int
+        :param stop: End of the range (exclusive).
+        :type stop: int
+        :param cct_algorithm: One of the opt4048_cct.CCT_* constants.
+        :type cct_algorithm: int
+        :return: Structured array with the fields of opt4048_batch.BATCH_DTYPE.
+        :rtype: numpy.ndarray
+        """
+        return opt4048_batch.convert_batch(
+            self.decode(start, stop)[0], self.cie_matrix, cct_algorithm
+        )
@@ -0,0 +1,309 @@
+# -------------------------------------------------------------------------------
+# opt4048_cct.py
+#
+# Correlated color temperature math for the SparkFun Qwiic OPT4048 Tristiumulus Color Sensor.
+# -------------------------------------------------------------------------------
+# Written by SparkFun Electronics, November, 2023 This python library supports the SparkFun Electroncis Qwiic ecosystem
+# More information on Qwiic is at https://www.sparkfun.com/qwiic
+#
+# ===============================================================================
+# Copyright (c) 2023 SparkFun Electronics
+# SPDX-License-Identifier: MIT
+# ===============================================================================
+
+"""
+Correlated color temperature (CCT) from CIE 1931 x/y chromaticity.
+
+Three algorithms are available:
+
+* CCT_MCCAMY: the cubic approximation from the OPT4048 datasheet. Fast, but
+  only accurate close to the Planckian locus and between about 2000K and
+  12500K.
+* CCT_HERNANDEZ_ANDRES: Hernandez-Andres et al. (1999) exponential fit,
+  3000K to 800000K.
+* CCT_ROBERTSON: Robertson's method, which interpolates between isotherms of
+  the Planckian locus. It also gives Duv, the signed distance from the locus.
+
+Every function accepts single values. The *_batch functions take NumPy arrays.
+"""
+
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# CCT algorithms
+CCT_MCCAMY = 0
+CCT_HERNANDEZ_ANDRES = 1
+CCT_ROBERTSON = 2
+
+# Robertson isotherms: reciprocal temperature (mired), CIE 1960 u, v of the
+# locus point and isotherm slope, from Wyszecki & Stiles.
+_ISOTHERMS = [
+    (0, 0.18006, 0.26352, -0.24341),
+    (10, 0.18066, 0.26589, -0.25479),
+    (20, 0.18133, 0.26846, -0.26876),
+    (30, 0.18208, 0.27119, -0.28539),
+    (40, 0.18293, 0.27407, -0.30470),
+    (50, 0.18388, 0.27709, -0.32675),
+    (60, 0.18494, 0.28021, -0.35156),
+    (70, 0.18611, 0.28342, -0.37915),
+    (80, 0.18740, 0.28668, -0.40955),
+    (90, 0.18880, 0.28997, -0.44278),
+    (100, 0.19032, 0.29326, -0.47888),
+    (125, 0.19462, 0.30141, -0.58204),
+    (150, 0.19962, 0.30921, -0.70471),
+    (175, 0.20525, 0.31647, -0.84901),
+    (200, 0.21142, 0.32312, -1.0182),
+    (225, 0.21807, 0.32909, -1.2168),
+    (250, 0.22511, 0.33439, -1.4512),
+    (275, 0.23247, 0.33904, -1.7298),
+    (300, 0.24010, 0.34308, -2.0637),
+    (325, 0.24792, 0.34655, -2.4681),
+    (350, 0.25591, 0.34951, -2.9641),
+    (375, 0.26400, 0.35200, -3.5814),
+    (400, 0.27218, 0.35407, -4.3633),
+    (425, 0.28039, 0.35577, -5.3762),
+    (450, 0.28863, 0.35714, -6.7262),
+    (475, 0.29685, 0.35823, -8.5955),
+    (500, 0.30505, 0.35907, -11.324),
+    (525, 0.31320, 0.35968, -15.628),
+    (550, 0.32129, 0.36011, -23.325),
+    (575, 0.32931, 0.36038, -40.770),
+    (600, 0.33724, 0.36051, -116.45),
+]
+
+# Columns of the isotherm table, with the slope turned into the normalization
+# factor of the distance calculation so a lookup needs no square roots.
+_MIRED = [row[0] for row in _ISOTHERMS]
+_U = [row[1] for row in _ISOTHERMS]
+_V = [row[2] for row in _ISOTHERMS]
+_SLOPE = [row[3] for row in _ISOTHERMS]
+_NORM = [1 / math.sqrt(1 + t * t) for t in _SLOPE]
+
+if np is not None:
+    _MIRED_NP = np.array(_MIRED, dtype=np.float64)
+    _U_NP = np.array(_U)
+    _V_NP = np.array(_V)
+    _SLOPE_NP = np.array(_SLOPE)
+    _NORM_NP = np.array(_NORM)
+
+
+def _xy_to_uv(x, y):
+    """
+    Convert CIE 1931 x/y to CIE 1960 u/v. Works on scalars and arrays.
+    """
+    d = -2 * x + 12 * y + 3
+
+    return 4 * x / d, 6 * y / d
+
+
+def _mccamy(x, y):
+    # Calculate the correlated color temperature, all of the
+    # math required to do this is in the datasheet.
+    n = (x - 0.3320) / (0.1858 - y)
+
+    return ((432 * n + 3601) * n + 6861) * n + 5517
+
+
+def _exp(t):
+    # Far from the locus the exponential fit overflows, the result is
+    # meaningless there anyway.
+    return math.exp(t) if t < 709 else math.inf
+
+
+def _hernandez_andres(x, y):
+    n = (x - 0.3366) / (y - 0.1735)
+    cct = (
+        -949.86315
+        + 6253.80338 * _exp(-n / 0.92159)
+        + 28.70599 * _exp(-n / 0.20039)
+        + 0.00004 * _exp(-n / 0.07125)
+    )
+
+    # The first set of coefficients covers 3000K - 50000K
+    if cct > 50000:
+        n = (x - 0.3356) / (y - 0.1691)
+        cct = (
+            36284.48953
+            + 0.00228 * _exp(-n / 0.07861)
+            + 5.4535e-36 * _exp(-n / 0.01543)
+        )
+
+    return cct
+
+
+def _isotherm_distance(i, u, v):
+    return ((v - _V[i]) - _SLOPE[i] * (u - _U[i])) * _NORM[i]
+
+
+def cct_duv(x, y):
+    """
+    Calculate CCT and Duv with Robertson's method. The isotherm bracketing the
+    color is found by bisection. Colors outside the table (below about 1667K) are
+    clamped to the nearest end of the table.
+
+    :param x: CIE x chromaticity coordinate.
+    :type x: float
+    :param y: CIE y chromaticity coordinate.
+    :type y: float
+    :return: CCT in Kelvin and Duv, positive above the Planckian locus.
+    :rtype: tuple
+    """
+    u, v = _xy_to_uv(x, y)
+
+    lo, hi = 0, len(_ISOTHERMS) - 1
+    d_lo = _isotherm_distance(lo, u, v)
+    d_hi = _isotherm_distance(hi, u, v)
+
+    # Colors inside the table are on the positive side of the first isotherm and
+    # the negative side of the last one. Outside, clamp to the end they are past.
+    if d_lo < 0:
+        hi, d_hi = 1, _isotherm_distance(1, u, v)
+    elif d_hi > 0:
+        lo, d_lo = hi - 1, _isotherm_distance(hi - 1, u, v)
+    else:
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            d_mid = _isotherm_distance(mid, u, v)
+
+            if (d_mid < 0) == (d_lo < 0):
+                lo, d_lo = mid, d_mid
+            else:
+                hi, d_hi = mid, d_mid
+
+    f = d_lo / (d_lo - d_hi) if d_lo != d_hi else 0.0
+    f = min(max(f, 0.0), 1.0)
+
+    mired = _MIRED[lo] + f * (_MIRED[hi] - _MIRED[lo])
+    cct = 1e6 / mired if mired > 0 else math.inf
+
+    u_t = _U[lo] + f * (_U[hi] - _U[lo])
+    v_t = _V[lo] + f * (_V[hi] - _V[lo])
+    duv = math.copysign(math.hypot(u - u_t, v - v_t), v - v_t)
+
+    return cct, duv
+
+
+def cct(x, y, algorithm=CCT_MCCAMY):
+    """
+    Calculate the correlated color temperature of a CIE 1931 x/y chromaticity.
+
+    :param x: CIE x chromaticity coordinate.
+    :type x: float
+    :param y: CIE y chromaticity coordinate.
+    :type y: float
+    :param algorithm: One of the CCT_* constants.
+    :type algorithm: int
+    :return: CCT in Kelvin.
+    :rtype: float
+    """
+    if algorithm == CCT_MCCAMY:
+        return _mccamy(x, y)
+    if algorithm == CCT_HERNANDEZ_ANDRES:
+        return _hernandez_andres(x, y)
+    if algorithm == CCT_ROBERTSON:
+        return cct_duv(x, y)[0]
+
+    raise ValueError("Unknown CCT algorithm %r" % algorithm)
+
+
+def cct_duv_batch(x, y):
+    """
+    Array version of cct_duv(), requires NumPy.
+
+    :param x: CIE x chromaticity coordinates.
+    :type x: numpy.ndarray
+    :param y: CIE y chromaticity coordinates.
+    :type y: numpy.ndarray
+    :return: CCT in Kelvin and Duv arrays.
+    :rtype: tuple
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    u, v = _xy_to_uv(x, y)
+
+    def distance(i):
+        return ((v - _V_NP[i]) - _SLOPE_NP[i] * (u - _U_NP[i])) * _NORM_NP[i]
+
+    last = len(_ISOTHERMS) - 1
+    lo = np.zeros(u.shape, dtype=np.intp)
+    hi = np.full(u.shape, last, dtype=np.intp)
+    d_lo = distance(lo)
+    d_hi = distance(hi)
+
+    # Clamp colors outside the table to the end they are past, see cct_duv()
+    hi[d_lo < 0] = 1
+    lo[(d_lo >= 0) & (d_hi > 0)] = last - 1
+
+    for _ in range(last.bit_length()):
+        active = (hi - lo) > 1
+        if not active.any():
+            break
+
+        mid = (lo + hi) // 2
+        same = (distance(mid) < 0) == (distance(lo) < 0)
+        lo = np.where(active & same, mid, lo)
+        hi = np.where(active & ~same, mid, hi)
+
+    d_lo = distance(lo)
+    d_hi = distance(hi)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        f = np.where(d_lo != d_hi, d_lo / (d_lo - d_hi), 0.0)
+        f = np.clip(f, 0.0, 1.0)
+
+        mired = _MIRED_NP[lo] + f * (_MIRED_NP[hi] - _MIRED_NP[lo])
+        cct = np.where(mired > 0, 1e6 / mired, np.inf)
+
+    u_t = _U_NP[lo] + f * (_U_NP[hi] - _U_NP[lo])
+    v_t = _V_NP[lo] + f * (_V_NP[hi] - _V_NP[lo])
+    duv = np.copysign(np.hypot(u - u_t, v - v_t), v - v_t)
+
+    return cct, duv
+
+
+def cct_batch(x, y, algorithm=CCT_MCCAMY):
+    """
+    Array version of cct(), requires NumPy.
+
+    :param x: CIE x chromaticity coordinates.
+    :type x: numpy.ndarray
+    :param y: CIE y chromaticity coordinates.
+    :type y: numpy.ndarray
+    :param algorithm: One of the CCT_* constants.
+    :type algorithm: int
+    :return: CCT in Kelvin.
+    :rtype: numpy.ndarray
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    if algorithm == CCT_MCCAMY:
+        return _mccamy(x, y)
+
+    if algorithm == CCT_HERNANDEZ_ANDRES:
+        with np.errstate(over="ignore"):
+            n = (x - 0.3366) / (y - 0.1735)
+            cct = (
+                -949.86315
+                + 6253.80338 * np.exp(-n / 0.92159)
+                + 28.70599 * np.exp(-n / 0.20039)
+                + 0.00004 * np.exp(-n / 0.07125)
+            )
+
+            n = (x - 0.3356) / (y - 0.1691)
+            high = (
+                36284.48953
+                + 0.00228 * np.exp(-n / 0.07861)
+                + 5.4535e-36 * np.exp(-n / 0.01543)
+            )
+
+        return np.where(cct > 50000, high, cct)
+
+    if algorithm == CCT_ROBERTSON:
+        return cct_duv_batch(x, y)[0]
+
+    raise ValueError("Unknown CCT algorithm %r" % algorithm)
@@ -0,0 +1,333 @@
+# -------------------------------------------------------------------------------
+# opt4048_instrument.py
+#
+# Bus instrumentation for the SparkFun Qwiic OPT4048 Tristiumulus Color Sensor.
+# -------------------------------------------------------------------------------
+# Written by SparkFun Electronics, November, 2023 This python library supports the SparkFun Electroncis Qwiic ecosystem
+# More information on Qwiic is at https://www.sparkfun.com/qwiic
+#
+# ===============================================================================
+# Copyright (c) 2023 SparkFun Electronics
+# SPDX-License-Identifier: MIT
+# ===============================================================================
+
+"""
+Observe every I2C transaction of a QwOpt4048.
+
+Instrumentation swaps a proxy in front of the sensor's I2C driver while it is
+attached, and puts the driver back when detached, so an uninstrumented sensor
+runs exactly as before. Hooks get a sfe_transaction_t per transaction: pre
+hooks before it starts, post hooks after it has finished, with its duration.
+The public QwOpt4048 method that caused the transaction is recorded too.
+
+TransactionCounter and LatencyHistogram are ready-made post hooks that
+aggregate per register and per method.
+"""
+
+from dataclasses import dataclass
+import bisect
+import threading
+import time
+
+# Transaction directions
+OPT4048_READ = "read"
+OPT4048_WRITE = "write"
+
+
+@dataclass
+class sfe_transaction_t:
+    """
+    One I2C transaction. duration is None until it has finished.
+    """
+
+    address: int
+    register: int
+    length: int
+    direction: str
+    method: str = None
+    duration: float = None
+
+
+class _InstrumentedDriver:
+    """
+    I2C driver proxy that runs the hooks of an Instrumentation around each
+    transaction.
+    """
+
+    def __init__(self, driver, instrumentation):
+        self.driver = driver
+        self._instrumentation = instrumentation
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
+
+    def readBlock(self, address, commandCode, nBytes):
+        return self._instrumentation._run(
+            self.driver.readBlock,
+            (address, commandCode, nBytes),
+            sfe_transaction_t(address, commandCode, nBytes, OPT4048_READ),
+        )
+
+    def writeBlock(self, address, commandCode, value):
+        return self._instrumentation._run(
+            self.driver.writeBlock,
+            (address, commandCode, value),
+            sfe_transaction_t(address, commandCode, len(value), OPT4048_WRITE),
+        )
+
+
+class Instrumentation:
+    """
+    Instrumentation
+    """
+
+    def __init__(self, sensor, pre=(), post=(), methods=True):
+        """
+        Initialize the Instrumentation class.
+        :param sensor: The sensor to instrument.
+        :type sensor: QwOpt4048
+        :param pre: Callbacks called with each sfe_transaction_t before it starts.
+        :type pre: list
+        :param post: Callbacks called with each sfe_transaction_t after it finished.
+        :type post: list
+        :param methods: Record which public method of the sensor caused each
+            transaction. This wraps the public methods of the sensor object while
+            attached.
+        :type methods: bool
+        :return: The Instrumentation object.
+        :rtype: Object
+        """
+        self.sensor = sensor
+        self.pre = list(pre)
+        self.post = list(post)
+        self.methods = methods
+
+        self._local = threading.local()
+        self._wrapped = []
+
+    def __enter__(self):
+        self.attach()
+        return self
+
+    def __exit__(self, *exc):
+        self.detach()
+
+    @property
+    def attached(self):
+        return isinstance(self.sensor._i2c, _InstrumentedDriver)
+
+    def attach(self):
+        """
+        Start observing the sensor's transactions.
+
+        :return: None
+        """
+        if self.attached:
+            return
+
+        self.sensor._i2c = _InstrumentedDriver(self.sensor._i2c, self)
+
+        if self.methods:
+            for name in dir(type(self.sensor)):
+                if name.startswith("_"):
+                    continue
+
+                attr = getattr(type(self.sensor), name)
+                if callable(attr) and not isinstance(attr, type):
+                    method = getattr(self.sensor, name)
+                    setattr(self.sensor, name, self._wrap(name, method))
+                    self._wrapped.append(name)
+
+    def detach(self):
+        """
+        Stop observing and restore the sensor's driver and methods.
+
+        :return: None
+        """
+        if not self.attached:
+            return
+
+        self.sensor._i2c = self.sensor._i2c.driver
+
+        for name in self._wrapped:
+            delattr(self.sensor, name)
+
+        self._wrapped = []
+
+    def _wrap(self, name, method):
+        local = self._local
+
+        def wrapper(*args, **kwargs):
+            # Transactions belong to the outermost public method, e.g. get_CCT()
+            # rather than the measure() it calls.
+            outer = getattr(local, "method", None)
+            if outer is None:
+                local.method = name
+
+            try:
+                return method(*args, **kwargs)
+            finally:
+                if outer is None:
+                    local.method = None
+
+        wrapper.__name__ = name
+        wrapper.__doc__ = method.__doc__
+
+        return wrapper
+
+    def _run(self, func, args, event):
+        event.method = getattr(self._local, "method", None)
+
+        for hook in self.pre:
+            hook(event)
+
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            event.duration = time.perf_counter() - start
+
+            for hook in self.post:
+                hook(event)
+
+
+class TransactionCounter:
+    """
+    Post hook counting transactions and bytes per register and per method.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Clear the counts.
+
+        :return: None
+        """
+        with self._lock:
+            # (direction, register) and (direction, method) to [transactions, bytes]
+            self.registers = {}
+            self.methods = {}
+
+    def __call__(self, event):
+        with self._lock:
+            for counts, key in (
+                (self.registers, (event.direction, event.register)),
+                (self.methods, (event.direction, event.method)),
+            ):
+                entry = counts.setdefault(key, [0, 0])
+                entry[0] += 1
+                entry[1] += event.length
+
+    def transactions(self, register=None, method=None, direction=None):
+        """
+        Count the transactions matching the given register, method and direction.
+
+        :param register: Only count this register.
+        :type register: int
+        :param method: Only count transactions caused by this method.
+        :type method: str
+        :param direction: OPT4048_READ or OPT4048_WRITE.
+        :type direction: str
+        :return: Number of transactions.
+        :rtype: int
+        """
+        if method is not None:
+            counts, key = self.methods, method
+        else:
+            counts, key = self.registers, register
+
+        with self._lock:
+            return sum(
+                entry[0]
+                for (d, k), entry in counts.items()
+                if (key is None or k == key) and (direction is None or d == direction)
+            )
+
+
+class LatencyHistogram:
+    """
+    Post hook collecting transaction durations into histograms per register and
+    per method.
+    """
+
+    # Upper bucket bounds in seconds, the last bucket is unbounded
+    DEFAULT_BOUNDS = (
+        10e-6,
+        20e-6,
+        50e-6,
+        100e-6,
+        200e-6,
+        500e-6,
+        1e-3,
+        2e-3,
+        5e-3,
+        10e-3,
+    )
+
+    def __init__(self, bounds=DEFAULT_BOUNDS):
+        """
+        :param bounds: Upper bounds of the buckets in seconds, ascending.
+        :type bounds: tuple
+        """
+        self.bounds = tuple(bounds)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Clear the histograms.
+
+        :return: None
+        """
+        with self._lock:
+            # Register and method to bucket counts
+            self.registers = {}
+            self.methods = {}
+
+    def __call__(self, event):
+        bucket = bisect.bisect_left(self.bounds, event.duration)
+
+        with self._lock:
+            for histograms, key in (
+                (self.registers, event.register),
+                (self.methods, event.method),
+            ):
+                if key not in histograms:
+                    histograms[key] = [0] * (len(self.bounds) + 1)
+                histograms[key][bucket] += 1
+
+    def percentile(self, p, register=None, method=None):
+        """
+        Estimate a latency percentile as the upper bound of the bucket it falls in.
+
+        :param p: Percentile, 0 - 100.
+        :type p: float
+        :param register: Use the histogram of this register.
+        :type register: int
+        :param method: Use the histogram of this method instead.
+        :type method: str
+        :return: Latency in seconds, inf if it falls in the last bucket, None without
+            samples.
+        :rtype: float
+        """
+        with self._lock:
+            if method is not None:
+                counts = self.methods.get(method)
+            else:
+                counts = self.registers.get(register)
+
+            if not counts:
+                return None
+
+            target = sum(counts) * p / 100
+            seen = 0
+
+            for bucket, count in enumerate(counts):
+                seen += count
+                if count and seen >= target:
+                    break
+
+        return self.bounds[bucket] if bucket < len(self.bounds) else float("inf")
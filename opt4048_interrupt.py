@@ -0,0 +1,453 @@
+# -------------------------------------------------------------------------------
+# opt4048_interrupt.py
+#
+# Interrupt driven acquisition for the SparkFun Qwiic OPT4048 Tristiumulus Color Sensor.
+# -------------------------------------------------------------------------------
+# Written by SparkFun Electronics, November, 2023 This python library supports the SparkFun Electroncis Qwiic ecosystem
+# More information on Qwiic is at https://www.sparkfun.com/qwiic
+#
+# ===============================================================================
+# Copyright (c) 2023 SparkFun Electronics
+# SPDX-License-Identifier: MIT
+# ===============================================================================
+
+"""
+Interrupt driven acquisition for the OPT4048.
+
+An edge source blocks until the INT pin of the sensor fires. InterruptReader
+waits on the source in a background thread and does one burst read per edge,
+so the host sleeps between conversions. Configure the sensor first, e.g. with
+set_int_mechanism(INT_DR_ALL_CHANNELS), and match the source polarity to
+set_int_active_high().
+
+WakeOnChangeReader turns the threshold comparator into a change detector: the
+threshold window sits around the last reported reading and is only moved when a
+change is reported, so the host only wakes up when the light moves by more than
+a set fraction from it, however slowly it drifts.
+"""
+
+import os
+import select
+import threading
+
+import qwiic_opt4048
+import opt4048_registers as REGS
+
+try:
+    import gpiod
+    from gpiod.line import Edge
+except ImportError:
+    gpiod = None
+
+
+class FakeEdgeSource:
+    """
+    In-process edge source. Call trigger() to simulate an edge on the INT pin.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._closed = False
+
+    def trigger(self):
+        """
+        Signal an edge.
+
+        :return: None
+        """
+        self._event.set()
+
+    def wait(self, timeout=None):
+        """
+        Block until an edge occurs. Edges that arrive before the reader gets to them
+        are merged into one.
+
+        :param timeout: Maximum time to wait in seconds, None to wait forever.
+        :type timeout: float
+        :return: True if an edge occurred, otherwise False.
+        :rtype: bool
+        """
+        if not self._event.wait(timeout) or self._closed:
+            return False
+
+        self._event.clear()
+
+        return True
+
+    def close(self):
+        """
+        Wake up any waiter and stop reporting edges.
+
+        :return: None
+        """
+        self._closed = True
+        self._event.set()
+
+
+class FdEdgeSource:
+    """
+    Edge source for a file descriptor that becomes readable or raises an exception
+    condition on an edge, such as a sysfs GPIO value file with its edge set, or a
+    pipe or eventfd written by another component.
+    """
+
+    def __init__(self, fd, events=select.POLLPRI | select.POLLERR):
+        """
+        :param fd: File descriptor or object with a fileno() method.
+        :param events: Poll events that signal an edge. The default suits sysfs
+            GPIO value files, use select.POLLIN for pipes and eventfds.
+        :type events: int
+        """
+        self._fd = fd if isinstance(fd, int) else fd.fileno()
+        self._events = events
+        self._poll = select.poll()
+        self._poll.register(self._fd, events)
+
+        # Wake-up pipe so close() can interrupt a blocking wait
+        self._wake_r, self._wake_w = os.pipe()
+        self._poll.register(self._wake_r, select.POLLIN)
+        self._closed = False
+
+        # Held while waiting, the wake-up pipe can't be closed under a waiter
+        self._lock = threading.Lock()
+
+        # sysfs GPIO files report an event straight away until read once
+        if events & select.POLLPRI:
+            self._acknowledge()
+
+    def _acknowledge(self):
+        """
+        Consume the pending event so the next poll blocks until a new edge.
+        """
+        try:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+        except OSError:
+            # Not seekable, i.e. a pipe or eventfd
+            pass
+
+        try:
+            os.read(self._fd, 64)
+        except BlockingIOError:
+            pass
+
+    def wait(self, timeout=None):
+        """
+        Block until an edge occurs.
+
+        :param timeout: Maximum time to wait in seconds, None to wait forever.
+        :type timeout: float
+        :return: True if an edge occurred, otherwise False.
+        :rtype: bool
+        """
+        with self._lock:
+            if self._closed:
+                return False
+
+            events = self._poll.poll(None if timeout is None else timeout * 1000)
+
+            for fd, _ in events:
+                if fd == self._fd:
+                    self._acknowledge()
+                    return True
+
+            return False
+
+    def close(self):
+        """
+        Wake up any waiter, stop reporting edges and close the wake-up pipe. The
+        wrapped file descriptor is left open.
+
+        :return: None
+        """
+        if self._closed:
+            return
+
+        # Makes a waiting poll return at once, so the lock is free shortly
+        os.write(self._wake_w, b"\0")
+
+        with self._lock:
+            self._closed = True
+            self._poll.unregister(self._wake_r)
+            os.close(self._wake_r)
+            os.close(self._wake_w)
+
+
+class GpioChipEdgeSource:
+    """
+    Edge source for a line of a Linux gpiochip character device, using libgpiod.
+    """
+
+    def __init__(self, chip, line, active_high=True, consumer="qwiic_opt4048"):
+        """
+        :param chip: Path of the gpiochip device, e.g. "/dev/gpiochip0".
+        :type chip: str
+        :param line: Line offset of the GPIO connected to INT.
+        :type line: int
+        :param active_high: Watch for rising edges if True, falling edges if False.
+            Should match set_int_active_high().
+        :type active_high: bool
+        :param consumer: Consumer label shown by the kernel for the line.
+        :type consumer: str
+        """
+        if gpiod is None:
+            raise ImportError("GpioChipEdgeSource requires the gpiod package")
+
+        edge = Edge.RISING if active_high else Edge.FALLING
+
+        self._request = gpiod.request_lines(
+            chip,
+            consumer=consumer,
+            config={line: gpiod.LineSettings(edge_detection=edge)},
+        )
+        self._closed = False
+
+        # Held while waiting, the line can't be released under a waiter
+        self._lock = threading.Lock()
+
+    def wait(self, timeout=None):
+        """
+        Block until an edge occurs.
+
+        :param timeout: Maximum time to wait in seconds, None to wait forever.
+        :type timeout: float
+        :return: True if an edge occurred, otherwise False.
+        :rtype: bool
+        """
+        with self._lock:
+            if self._closed:
+                return False
+
+            ready = self._request.wait_edge_events(timeout)
+            if ready:
+                self._request.read_edge_events()
+
+            if self._closed:
+                self._request.release()
+                return False
+
+            return ready
+
+    def close(self):
+        """
+        Release the GPIO line. If another thread is waiting, the line is released
+        when its wait returns.
+
+        :return: None
+        """
+        self._closed = True
+
+        if self._lock.acquire(blocking=False):
+            self._request.release()
+            self._lock.release()
+
+
+class InterruptReader:
+    """
+    Reads one measurement from the sensor for every edge reported by an edge source,
+    in a background thread, and hands it to a callback and/or a queue.
+    """
+
+    def __init__(self, sensor, source, callback=None, queue=None):
+        """
+        :param sensor: The sensor to read.
+        :type sensor: QwOpt4048
+        :param source: Edge source connected to the INT pin of the sensor.
+        :param callback: Called with each sfe_measurement_t (optional).
+        :param queue: queue.Queue each sfe_measurement_t is put on (optional).
+        """
+        self.sensor = sensor
+        self.source = source
+        self.callback = callback
+        self.queue = queue
+
+        # Longest single wait on the source, bounds how long stop() can take
+        self.wake_interval = 0.5
+
+        # Exception that stopped the reader thread, if any
+        self.error = None
+
+        self._latched = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Start reading in the background.
+
+        :return: None
+        """
+        # A latched INT pin stays active until FLAGS is read, so it has to be
+        # read after every sample or no further edges will arrive.
+        self._latched = bool(self.sensor.get_int_latch())
+        self._stop.clear()
+        self.error = None
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Stop the background reader. The thread notices within wake_interval. The
+        edge source is left open, so the reader can be started again. Close it
+        when it is no longer needed.
+
+        :param timeout: Maximum time to wait for the thread in seconds.
+        :type timeout: float
+        :return: None
+        """
+        self._stop.set()
+
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _read(self):
+        """
+        Handle one edge and return the measurement to report, or None.
+        """
+        measurement = self.sensor.measure()
+
+        if self._latched:
+            self.sensor.get_all_flags()
+
+        return measurement
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                if not self.source.wait(self.wake_interval):
+                    continue
+
+                if self._stop.is_set():
+                    break
+
+                measurement = self._read()
+                if measurement is None:
+                    continue
+
+                if self.callback is not None:
+                    self.callback(measurement)
+
+                if self.queue is not None:
+                    self.queue.put(measurement)
+        except Exception as err:
+            self.error = err
+
+
+class WakeOnChangeReader(InterruptReader):
+    """
+    Reports a measurement only when the light has changed by more than a given
+    fraction since the last report. The sensor does the comparing: the low and
+    high thresholds form a window around the last reported reading, and each
+    reported change re-centers it with a single burst write. An interrupt whose
+    reading is back inside the window leaves it where it is. Without changes
+    there is no bus traffic at all. The sensor has to run in continuous mode.
+    """
+
+    def __init__(
+        self,
+        sensor,
+        source,
+        callback=None,
+        queue=None,
+        change=0.05,
+        channel=1,
+        fault_count=None,
+    ):
+        """
+        :param sensor: The sensor to read.
+        :type sensor: QwOpt4048
+        :param source: Edge source connected to the INT pin of the sensor.
+        :param callback: Called with each changed sfe_measurement_t (optional).
+        :param queue: queue.Queue each changed sfe_measurement_t is put on
+            (optional).
+        :param change: Relative change of the channel code that is reported.
+        :type change: float
+        :param channel: Channel watched, 1 (Y) by default.
+        :type channel: int
+        :param fault_count: Consecutive conversions outside the window needed for an
+            interrupt, a opt4048FaultCountT. Unchanged if None.
+        :type fault_count: opt4048FaultCountT
+        """
+        super().__init__(sensor, source, callback, queue)
+
+        self.change = change
+        self.channel = channel
+        self.fault_count = fault_count
+
+        # Channel code of the last reported measurement
+        self.reference = None
+        # Interrupts that didn't amount to a change
+        self.spurious = 0
+
+    def _delta(self, code):
+        """
+        Half width of the threshold window around a channel code.
+        """
+        # Keep the window at least one threshold step wide in the dark
+        return max(code * self.change, 256)
+
+    def _recenter(self, code):
+        """
+        Put the threshold window around a channel code.
+        """
+        delta = self._delta(code)
+
+        self.sensor.set_thresholds(max(code - delta, 0), code + delta, channel=None)
+
+    def start(self):
+        """
+        Configure the interrupt, center the window on the current reading and start
+        watching in the background.
+
+        :return: None
+        """
+        config = qwiic_opt4048.sfe_config_t(
+            int_mechanism=REGS.opt4048IntCFGT.INT_SMBUS_ALERT,
+            int_latch=True,
+            threshold_channel=self.channel,
+        )
+        if self.fault_count is not None:
+            config.fault_count = self.fault_count
+
+        self.sensor.apply_config(config)
+
+        # Start from a fresh conversion, not whatever is in the result registers
+        measurement = self.sensor.read_next(
+            2 * self.sensor.get_frame_period()
+        ) or self.sensor.measure()
+
+        self.reference = measurement.codes[self.channel]
+        self._recenter(self.reference)
+        self.sensor.get_all_flags()
+
+        super().start()
+
+    def _read(self):
+        measurement = self.sensor.measure()
+        code = measurement.codes[self.channel]
+
+        if abs(code - self.reference) <= self._delta(self.reference):
+            # Outside the window for a few conversions, but back by now. The
+            # window stays around the reference, so a slow drift is still
+            # reported once it adds up.
+            self.sensor.get_all_flags()
+            self.spurious += 1
+            return None
+
+        self.reference = code
+        self._recenter(code)
+        self.sensor.get_all_flags()
+
+        return measurement
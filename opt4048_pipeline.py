@@ -0,0 +1,310 @@
+# -------------------------------------------------------------------------------
+# opt4048_pipeline.py
+#
+# Streaming filters for the SparkFun Qwiic OPT4048 Tristiumulus Color Sensor.
+# -------------------------------------------------------------------------------
+# Written by SparkFun Electronics, November, 2023 This python library supports the SparkFun Electroncis Qwiic ecosystem
+# More information on Qwiic is at https://www.sparkfun.com/qwiic
+#
+# ===============================================================================
+# Copyright (c) 2023 SparkFun Electronics
+# SPDX-License-Identifier: MIT
+# ===============================================================================
+
+"""
+Filter stages that work on the raw channel codes of sfe_measurement_t.
+
+Filtering the four integer codes once and running the color math on the result
+is much cheaper than filtering every derived value. Each stage takes
+measurements one at a time with push(), which returns the filtered
+measurement, or None if the stage holds the sample back. The output is again a
+sfe_measurement_t, so CIE x/y, lux and CCT are computed from the filtered codes
+on first use. Its exponents and CRCs are worked out again for the filtered
+codes, and the sample counters are those of the latest input.
+
+Stages can be chained with Pipeline, and every stage can filter a stream of
+measurements when called with it:
+
+    smooth = Pipeline(OutlierReject(), Median(5), Ema(shift=2))
+    for m in smooth(sensor.stream()):
+        print(m.CCT)
+"""
+
+from collections import deque
+from dataclasses import replace
+import abc
+import bisect
+
+import qwiic_opt4048
+
+
+def _filtered(measurement, codes, **changes):
+    """
+    Copy a measurement with filtered codes. Each code keeps the exponent of the
+    latest sample, raised if its mantissa wouldn't fit into 20 bits, and gets a
+    matching CRC, so code >> exponent is the mantissa the CRC covers, as for a
+    sample from the device.
+    """
+    exponents = tuple(
+        min(max(code.bit_length() - 20, exponent), 15)
+        for code, exponent in zip(codes, measurement.exponents)
+    )
+    counters = measurement.counters
+    calc_crc = qwiic_opt4048.calc_crc
+
+    return replace(
+        measurement,
+        codes=codes,
+        exponents=exponents,
+        crcs=tuple(
+            calc_crc(exponents[ch], codes[ch] >> exponents[ch], counters[ch])
+            for ch in range(4)
+        ),
+        **changes,
+    )
+
+
+class _Stage(abc.ABC):
+    """
+    Base class of the filter stages.
+    """
+
+    @abc.abstractmethod
+    def push(self, measurement):
+        """
+        Filter one measurement.
+
+        :param measurement: The next measurement.
+        :type measurement: sfe_measurement_t
+        :return: The filtered measurement, or None if there is no output yet.
+        :rtype: sfe_measurement_t
+        """
+
+    def reset(self):
+        """
+        Forget all previous measurements.
+
+        :return: None
+        """
+
+    def __call__(self, measurements):
+        for measurement in measurements:
+            out = self.push(measurement)
+            if out is not None:
+                yield out
+
+
+class Pipeline(_Stage):
+    """
+    Stages applied one after another.
+    """
+
+    def __init__(self, *stages):
+        self.stages = stages
+
+    def push(self, measurement):
+        for stage in self.stages:
+            measurement = stage.push(measurement)
+            if measurement is None:
+                return None
+
+        return measurement
+
+    def reset(self):
+        for stage in self.stages:
+            stage.reset()
+
+
+class Oversample(_Stage):
+    """
+    Average every n measurements into one, dividing the output rate by n.
+    """
+
+    def __init__(self, n):
+        """
+        :param n: Number of measurements per output.
+        :type n: int
+        """
+        self.n = n
+        self.reset()
+
+    def reset(self):
+        self._sums = [0, 0, 0, 0]
+        self._count = 0
+        self._missed = 0
+        self._valid = True
+
+    def push(self, measurement):
+        sums = self._sums
+        codes = measurement.codes
+
+        sums[0] += codes[0]
+        sums[1] += codes[1]
+        sums[2] += codes[2]
+        sums[3] += codes[3]
+
+        self._count += 1
+        self._missed += measurement.missed
+        self._valid = self._valid and measurement.valid
+
+        if self._count < self.n:
+            return None
+
+        n = self.n
+        out = _filtered(
+            measurement,
+            tuple((s + n // 2) // n for s in sums),
+            valid=self._valid,
+            missed=self._missed,
+        )
+
+        self.reset()
+
+        return out
+
+
+class Ema(_Stage):
+    """
+    Exponential moving average with a smoothing factor of 2**-shift, kept in
+    fixed point so the codes stay integers.
+    """
+
+    def __init__(self, shift=3):
+        """
+        :param shift: Smoothing factor exponent, larger is smoother.
+        :type shift: int
+        """
+        self.shift = shift
+        self.reset()
+
+    def reset(self):
+        self._acc = None
+
+    def push(self, measurement):
+        shift = self.shift
+        codes = measurement.codes
+
+        if self._acc is None:
+            self._acc = [code << shift for code in codes]
+        else:
+            acc = self._acc
+            for ch in range(4):
+                acc[ch] += codes[ch] - (acc[ch] >> shift)
+
+        return _filtered(measurement, tuple(a >> shift for a in self._acc))
+
+
+class Median(_Stage):
+    """
+    Sliding median of the last n measurements, per channel. Each channel keeps
+    its window sorted, so a sample costs a binary search plus an O(n) list insert
+    and delete: cheap for the short windows a median is used with, but not the
+    O(1) of the other stages.
+    """
+
+    def __init__(self, n=5):
+        """
+        :param n: Window length, odd values give a true median.
+        :type n: int
+        """
+        self.n = n
+        self.reset()
+
+    def reset(self):
+        self._history = deque()
+        # Sorted window of each channel
+        self._sorted = [[], [], [], []]
+
+    def push(self, measurement):
+        codes = measurement.codes
+        self._history.append(codes)
+
+        if len(self._history) > self.n:
+            old = self._history.popleft()
+            for ch in range(4):
+                window = self._sorted[ch]
+                del window[bisect.bisect_left(window, old[ch])]
+
+        for ch in range(4):
+            bisect.insort(self._sorted[ch], codes[ch])
+
+        middle = len(self._history) // 2
+
+        return _filtered(measurement, tuple(window[middle] for window in self._sorted))
+
+
+class OutlierReject(_Stage):
+    """
+    Drop measurements that are corrupt, stale or far from the recent level.
+
+    Measurements with a CRC error and re-reads of an already seen conversion
+    (unchanged sample counters) are always dropped. A measurement whose codes
+    differ from the running level by more than the given fraction is dropped as
+    a spike, unless it persists, in which case the light really changed and the
+    level follows it.
+    """
+
+    def __init__(self, threshold=0.25, persist=3, shift=3):
+        """
+        :param threshold: Largest accepted relative deviation from the level.
+        :type threshold: float
+        :param persist: Number of consecutive outliers after which the last one is
+            accepted as a real change.
+        :type persist: int
+        :param shift: Smoothing factor exponent of the running level, see Ema.
+        :type shift: int
+        """
+        self.threshold = threshold
+        self.persist = persist
+        self.shift = shift
+
+        # Number of measurements dropped, by reason
+        self.rejected_crc = 0
+        self.rejected_stale = 0
+        self.rejected_outlier = 0
+
+        self.reset()
+
+    def reset(self):
+        self._level = None
+        self._counters = None
+        self._outliers = 0
+
+    def push(self, measurement):
+        if not measurement.valid:
+            self.rejected_crc += 1
+            return None
+
+        if measurement.counters == self._counters:
+            self.rejected_stale += 1
+            return None
+
+        self._counters = measurement.counters
+        shift = self.shift
+        codes = measurement.codes
+
+        if self._level is None:
+            self._level = [code << shift for code in codes]
+            return measurement
+
+        level = self._level
+
+        for ch in range(4):
+            reference = level[ch] >> shift
+            if abs(codes[ch] - reference) > self.threshold * max(reference, 1):
+                self._outliers += 1
+
+                if self._outliers < self.persist:
+                    self.rejected_outlier += 1
+                    return None
+
+                # Not a spike, start over from the new level
+                self._level = [code << shift for code in codes]
+                self._outliers = 0
+                return measurement
+
+        self._outliers = 0
+        for ch in range(4):
+            level[ch] += codes[ch] - (level[ch] >> shift)
+
+        return measurement
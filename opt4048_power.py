@@ -0,0 +1,311 @@
+# -------------------------------------------------------------------------------
+# opt4048_power.py
+#
+# Duty-cycled sampling for the SparkFun Qwiic OPT4048 Tristiumulus Color Sensor.
+# -------------------------------------------------------------------------------
+# Written by SparkFun Electronics, November, 2023 This python library supports the SparkFun Electroncis Qwiic ecosystem
+# More information on Qwiic is at https://www.sparkfun.com/qwiic
+#
+# ===============================================================================
+# Copyright (c) 2023 SparkFun Electronics
+# SPDX-License-Identifier: MIT
+# ===============================================================================
+
+"""
+Sample at a fixed period with the sensor and host asleep in between.
+
+PowerScheduler picks the operating mode from the sample period and the
+conversion time needed for the precision target:
+
+* continuous: when samples are needed about as fast as the device converts,
+  it runs freely and each sample is read with QwOpt4048.read_if_new(), with no
+  writes.
+* one-shot from power-down: for longer periods each sample is one CONTROL
+  write to trigger a conversion and one burst read, see
+  QwOpt4048.measure_once(). AUTO_ONE_SHOT is used with automatic range, so the
+  range is found afresh for every sparse sample.
+* one-shot with quick wake: when the samples are close enough that keeping
+  the device partly powered costs less than waking it up each time.
+
+The host sleeps between samples in every mode. Enable the shadow cache of the
+sensor so triggering a one-shot doesn't need a register read.
+
+The energy figures are estimates from the supply currents below, which are
+rough values: set the ones of your board for useful numbers. Bus traffic is
+not included.
+"""
+
+from dataclasses import dataclass
+import math
+import time
+
+import qwiic_opt4048
+import opt4048_registers as REGS
+
+# Power modes
+OPT4048_POWER_CONTINUOUS = "continuous"
+OPT4048_POWER_ONE_SHOT = "one-shot"
+OPT4048_POWER_ONE_SHOT_QWAKE = "one-shot quick wake"
+
+# Rough supply currents in amps: converting, powered down, and in standby with
+# quick wake enabled
+ACTIVE_CURRENT = 100e-6
+POWER_DOWN_CURRENT = 2e-6
+QWAKE_CURRENT = 20e-6
+
+# Continuous mode is used while the period is shorter than this many frames
+_CONTINUOUS_FRAMES = 1.5
+
+
+@dataclass
+class sfe_power_plan_t:
+    """
+    The operating mode chosen by a PowerScheduler and its estimated cost.
+    """
+
+    mode: str = OPT4048_POWER_CONTINUOUS
+    conversion_time: int = REGS.opt4048ConversionTimeT.CONVERSION_TIME_100MS.value
+    auto_range: bool = False
+    # Fraction of the time the device is converting
+    duty_cycle: float = 1.0
+    # Estimated sensor energy per sample in joules
+    energy_per_sample: float = 0.0
+    # Estimated average sensor supply current in amps
+    average_current: float = 0.0
+    # Register writes needed per sample
+    writes_per_sample: int = 0
+
+
+class PowerScheduler:
+    """
+    PowerScheduler
+    """
+
+    def __init__(
+        self,
+        sensor,
+        period,
+        precision=None,
+        noise=0.001,
+        conversion_time=None,
+        supply_voltage=3.3,
+    ):
+        """
+        Initialize the PowerScheduler class.
+        :param sensor: The sensor to sample.
+        :type sensor: QwOpt4048
+        :param period: Time between samples in seconds. The device can't convert
+            faster than one frame of four channels, so shorter periods are
+            stretched to one frame.
+        :type period: float
+        :param precision: Target relative noise of the readings. The shortest
+            conversion time predicted to meet it is used.
+        :type precision: float
+        :param noise: Relative noise of the readings at a 100ms conversion time,
+            e.g. measured with opt4048_autorange.AutoRangeController.
+        :type noise: float
+        :param conversion_time: Conversion time to use if no precision is given, a
+            opt4048ConversionTimeT. The current one if None.
+        :type conversion_time: opt4048ConversionTimeT
+        :param supply_voltage: Sensor supply voltage for the energy estimate.
+        :type supply_voltage: float
+        :return: The PowerScheduler object.
+        :rtype: Object
+        """
+        self.sensor = sensor
+        self.supply_voltage = supply_voltage
+
+        # Samples taken, and cycles that started late because a sample took longer
+        # than the period
+        self.samples = 0
+        self.late = 0
+
+        if precision is not None:
+            conversion_time = self._conversion_time_for(precision, noise)
+        elif conversion_time is None:
+            conversion_time = sensor.get_conversion_time()
+
+        conversion_time = qwiic_opt4048._enum_value(conversion_time)
+        self._frame = 4 * qwiic_opt4048._CONVERSION_TIME_SECONDS[conversion_time]
+        self.period = max(period, self._frame)
+
+        auto_range = sensor.get_range() == REGS.opt4048RangeT.RANGE_AUTO.value
+
+        self.plan = self._make_plan(conversion_time, auto_range)
+        self._started = False
+
+    @staticmethod
+    def _conversion_time_for(precision, noise):
+        """
+        Shortest conversion time whose predicted noise meets the precision, with
+        the noise falling with the square root of the conversion time.
+        """
+        seconds = qwiic_opt4048._CONVERSION_TIME_SECONDS
+
+        for index, tconv in enumerate(seconds):
+            if noise * math.sqrt(0.1 / tconv) <= precision:
+                return index
+
+        return len(seconds) - 1
+
+    def _make_plan(self, conversion_time, auto_range):
+        """
+        Pick the mode with the lowest energy per sample that can keep up.
+        """
+        frame = self._frame
+        wake = qwiic_opt4048._WAKE_TIME_SECONDS
+        period = self.period
+
+        if period < _CONTINUOUS_FRAMES * frame:
+            mode = OPT4048_POWER_CONTINUOUS
+            active = period
+            charge = ACTIVE_CURRENT * period
+            writes = 0
+        else:
+            idle = period - frame
+            one_shot = ACTIVE_CURRENT * (frame + wake) + POWER_DOWN_CURRENT * idle
+            qwake = ACTIVE_CURRENT * frame + QWAKE_CURRENT * idle
+
+            if qwake < one_shot:
+                mode, charge = OPT4048_POWER_ONE_SHOT_QWAKE, qwake
+            else:
+                mode, charge = OPT4048_POWER_ONE_SHOT, one_shot
+
+            active = frame
+            writes = 1
+
+        return sfe_power_plan_t(
+            mode=mode,
+            conversion_time=conversion_time,
+            auto_range=auto_range and mode != OPT4048_POWER_CONTINUOUS,
+            duty_cycle=min(active / period, 1.0),
+            energy_per_sample=charge * self.supply_voltage,
+            average_current=charge / period,
+            writes_per_sample=writes,
+        )
+
+    @property
+    def duty_cycle(self):
+        return self.plan.duty_cycle
+
+    @property
+    def energy_per_sample(self):
+        return self.plan.energy_per_sample
+
+    def _start(self):
+        """
+        Put the sensor into the planned mode.
+        """
+        if self.plan.mode == OPT4048_POWER_CONTINUOUS:
+            self.sensor.apply_config(
+                qwiic_opt4048.sfe_config_t(
+                    conversion_time=self.plan.conversion_time,
+                    operation_mode=REGS.opt4048OperationModeT.OPERATION_MODE_CONTINUOUS,
+                )
+            )
+
+        self._started = True
+
+    def sample(self):
+        """
+        Take one sample in the planned mode, without waiting for the period.
+
+        :return: The measurement, or None if the conversion timed out.
+        :rtype: sfe_measurement_t
+        """
+        if not self._started:
+            self._start()
+
+        if self.plan.mode == OPT4048_POWER_CONTINUOUS:
+            measurement = self._read_frame()
+        else:
+            measurement = self.sensor.measure_once(
+                conversion_time=self.plan.conversion_time,
+                qwake=self.plan.mode == OPT4048_POWER_ONE_SHOT_QWAKE,
+                auto_range=self.plan.auto_range,
+                timeout=self.period,
+            )
+
+        if measurement is not None:
+            self.samples += 1
+
+        return measurement
+
+    def _read_frame(self):
+        """
+        Read the next complete conversion in continuous mode. A plain burst read
+        could return the same conversion twice or mix two of them, so
+        read_if_new() is polled until a new one arrives.
+        """
+        # The first conversion after a CONTROL write takes up to two frames to
+        # be confirmed, see QwOpt4048.read_if_new()
+        deadline = time.monotonic() + self.period + 2 * self._frame
+        backoff = self._frame / 16
+
+        while True:
+            measurement = self.sensor.read_if_new()
+
+            if measurement is not None or time.monotonic() >= deadline:
+                return measurement
+
+            time.sleep(backoff)
+
+    def run(self, count=None):
+        """
+        Yield a measurement every period, sleeping in between. If a sample takes
+        longer than the period the schedule restarts from now instead of
+        catching up.
+
+        :param count: Number of measurements, None to run forever.
+        :type count: int
+        :return: Generator of measurements.
+        """
+        if not self._started:
+            self._start()
+
+        if self.plan.mode == OPT4048_POWER_CONTINUOUS:
+            # Give the first conversions time to finish
+            next_time = time.monotonic() + self._frame
+        else:
+            next_time = time.monotonic()
+
+        taken = 0
+
+        while count is None or taken < count:
+            delay = next_time - time.monotonic()
+
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -self.period:
+                self.late += 1
+                next_time = time.monotonic()
+
+            next_time += self.period
+
+            measurement = self.sample()
+            if measurement is None:
+                continue
+
+            taken += 1
+            yield measurement
+
+    def close(self):
+        """
+        Power the sensor down fully. One-shot modes already leave it powered down
+        after every sample, so only continuous mode and quick wake need a write.
+
+        :return: None
+        """
+        self.sensor.apply_config(
+            qwiic_opt4048.sfe_config_t(
+                operation_mode=REGS.opt4048OperationModeT.OPERATION_MODE_POWER_DOWN,
+                qwake=False,
+            )
+        )
+        self._started = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,255 @@
+# -------------------------------------------------------------------------------
+# opt4048_record.py
+#
+# Record and replay the bus traffic of the SparkFun Qwiic OPT4048 Tristiumulus Color Sensor.
+# -------------------------------------------------------------------------------
+# Written by SparkFun Electronics, November, 2023 This python library supports the SparkFun Electroncis Qwiic ecosystem
+# More information on Qwiic is at https://www.sparkfun.com/qwiic
+#
+# ===============================================================================
+# Copyright (c) 2023 SparkFun Electronics
+# SPDX-License-Identifier: MIT
+# ===============================================================================
+
+"""
+Capture a sensor session once and run it again without the sensor.
+
+RecordingDriver wraps an I2C driver and logs every readBlock()/writeBlock() to
+a binary file. ReplayDriver serves the recorded reads back to a QwOpt4048,
+either as fast as possible or with the original timing.
+
+The file starts with the 8-byte magic b"OPT4048R" and a version byte. Each
+transaction follows as a little-endian record header (timestamp in seconds
+since the recording started as a double, direction, address, register,
+payload length) and the payload bytes.
+"""
+
+import struct
+import time
+
+_MAGIC = b"OPT4048R"
+_VERSION = 1
+
+_RECORD = struct.Struct("<dBBBH")
+
+# Record directions
+_READ = 0
+_WRITE = 1
+
+
+class Opt4048ReplayError(IOError):
+    """
+    The code under replay made a transaction that doesn't match the recording.
+    """
+
+
+def _open(file, mode):
+    """
+    Open file if it is a path, return it with whether we own it.
+    """
+    if hasattr(file, "read") or hasattr(file, "write"):
+        return file, False
+
+    return open(file, mode), True
+
+
+class RecordingDriver:
+    """
+    RecordingDriver
+    """
+
+    def __init__(self, driver, file):
+        """
+        Initialize the RecordingDriver class.
+        :param driver: The I2C driver to record.
+        :param file: Path or binary file object to write the recording to.
+        :return: The RecordingDriver object.
+        :rtype: Object
+        """
+        self.driver = driver
+        self._file, self._owned = _open(file, "wb")
+        self._file.write(_MAGIC + bytes([_VERSION]))
+        self._start = time.monotonic()
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Finish the recording, closing the file if it was opened from a path.
+
+        :return: None
+        """
+        if self._owned:
+            self._file.close()
+        else:
+            self._file.flush()
+
+    def _record(self, direction, address, register, payload):
+        self._file.write(
+            _RECORD.pack(
+                time.monotonic() - self._start,
+                direction,
+                address,
+                register,
+                len(payload),
+            )
+        )
+        self._file.write(bytes(payload))
+
+    def readBlock(self, address, commandCode, nBytes):
+        block = self.driver.readBlock(address, commandCode, nBytes)
+        self._record(_READ, address, commandCode, block)
+
+        return block
+
+    def writeBlock(self, address, commandCode, value):
+        self.driver.writeBlock(address, commandCode, value)
+        self._record(_WRITE, address, commandCode, value)
+
+
+def read_recording(file):
+    """
+    Load a recording.
+
+    :param file: Path or binary file object of the recording.
+    :return: (timestamp, is_write, address, register, payload) per transaction.
+    :rtype: list
+    """
+    f, owned = _open(file, "rb")
+
+    try:
+        data = f.read()
+    finally:
+        if owned:
+            f.close()
+
+    if data[: len(_MAGIC)] != _MAGIC or data[len(_MAGIC)] != _VERSION:
+        raise ValueError("Not an OPT4048 recording")
+
+    records = []
+    offset = len(_MAGIC) + 1
+
+    while offset < len(data):
+        timestamp, direction, address, register, length = _RECORD.unpack_from(
+            data, offset
+        )
+        offset += _RECORD.size
+        payload = data[offset : offset + length]
+        offset += length
+
+        records.append((timestamp, direction == _WRITE, address, register, payload))
+
+    return records
+
+
+class ReplayDriver:
+    """
+    ReplayDriver
+    """
+
+    def __init__(self, file, realtime=False, strict=True):
+        """
+        Initialize the ReplayDriver class.
+        :param file: Path or binary file object of the recording.
+        :param realtime: Delay each read until the time it happened in the
+            recording, measured from the first transaction of the replay. By
+            default the recording is served as fast as it is read.
+        :type realtime: bool
+        :param strict: Require every transaction to match the recording. When False,
+            writes are ignored and each read skips ahead to the next recorded read
+            of the same register and length, so code that makes fewer or different
+            transactions can still be replayed.
+        :type strict: bool
+        :return: The ReplayDriver object.
+        :rtype: Object
+        """
+        self.records = read_recording(file)
+        self.realtime = realtime
+        self.strict = strict
+
+        self.position = 0
+        self._start = None
+
+    @property
+    def remaining(self):
+        """
+        Number of recorded transactions not replayed yet.
+        """
+        return len(self.records) - self.position
+
+    def rewind(self):
+        """
+        Start the replay over.
+
+        :return: None
+        """
+        self.position = 0
+        self._start = None
+
+    def isDeviceConnected(self, address):
+        return any(record[2] == address for record in self.records)
+
+    def ping(self, address):
+        return self.isDeviceConnected(address)
+
+    def _next(self, is_write, address, register, length):
+        """
+        Find the record of the next transaction and advance past it.
+        """
+        while self.position < len(self.records):
+            record = self.records[self.position]
+            self.position += 1
+
+            if (
+                record[1:4] == (is_write, address, register)
+                and len(record[4]) == length
+            ):
+                break
+
+            if self.strict:
+                raise Opt4048ReplayError(
+                    "Transaction %d is %s of %d bytes at 0x%02X, replay asked for %s "
+                    "of %d bytes at 0x%02X"
+                    % (
+                        self.position - 1,
+                        "a write" if record[1] else "a read",
+                        len(record[4]),
+                        record[3],
+                        "a write" if is_write else "a read",
+                        length,
+                        register,
+                    )
+                )
+        else:
+            raise EOFError("End of the OPT4048 recording")
+
+        if self.realtime:
+            if self._start is None:
+                self._start = time.monotonic() - record[0]
+
+            delay = self._start + record[0] - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        return record[4]
+
+    def readBlock(self, address, commandCode, nBytes):
+        return list(self._next(False, address, commandCode, nBytes))
+
+    def writeBlock(self, address, commandCode, value):
+        if not self.strict:
+            return
+
+        payload = self._next(True, address, commandCode, len(value))
+
+        if payload != bytes(value):
+            raise Opt4048ReplayError(
+                "Write to 0x%02X differs from the recording" % commandCode
+            )
@@ -68,7 +68,7 @@ SFE_OPT4048_REGISTER_EXP_RES_CH0 = 0x00
 class opt4048_reg_exp_res_ch0_bits_t(ctypes.LittleEndianStructure):
     _fields_ = [
         ("result_msb_ch0", ctypes.c_uint16, 12),
-        ("exponent_ch0", ctypes.c_uint8, 4),
+        ("exponent_ch0", ctypes.c_uint16, 4),
     ]
 
 
@@ -105,7 +105,7 @@ SFE_OPT4048_REGISTER_EXP_RES_CH1 = 0x02
 class opt4048_reg_exp_res_ch1_bits_t(ctypes.LittleEndianStructure):
     _fields_ = [
         ("result_msb_ch1", ctypes.c_uint16, 12),
-        ("exponent_ch1", ctypes.c_uint8, 4),
+        ("exponent_ch1", ctypes.c_uint16, 4),
     ]
 
 
@@ -142,7 +142,7 @@ SFE_OPT4048_REGISTER_EXP_RES_CH2 = 0x04
 class opt4048_reg_exp_res_ch2_bits_t(ctypes.LittleEndianStructure):
     _fields_ = [
         ("result_msb_ch2", ctypes.c_uint16, 12),
-        ("exponent_ch2", ctypes.c_uint8, 4),
+        ("exponent_ch2", ctypes.c_uint16, 4),
     ]
 
 
@@ -179,7 +179,7 @@ SFE_OPT4048_REGISTER_EXP_RES_CH3 = 0x06
 class opt4048_reg_exp_res_ch3_bits_t(ctypes.LittleEndianStructure):
     _fields_ = [
         ("result_msb_ch3", ctypes.c_uint16, 12),
-        ("exponent_ch3", ctypes.c_uint8, 4),
+        ("exponent_ch3", ctypes.c_uint16, 4),
     ]
 
 
@@ -216,7 +216,7 @@ SFE_OPT4048_REGISTER_THRESH_L_EXP_RES = 0x08
 class opt4048_reg_thresh_exp_res_low_bits_t(ctypes.LittleEndianStructure):
     _fields_ = [
         ("thresh_result", ctypes.c_uint16, 12),
-        ("thresh_exp", ctypes.c_uint8, 4),
+        ("thresh_exp", ctypes.c_uint16, 4),
     ]
 
 
@@ -234,7 +234,7 @@ SFE_OPT4048_REGISTER_THRESH_H_EXP_RES = 0x09
 class opt4048_reg_thresh_exp_res_high_bits_t(ctypes.LittleEndianStructure):
     _fields_ = [
         ("thresh_result", ctypes.c_uint16, 12),
-        ("thresh_exp", ctypes.c_uint8, 4),
+        ("thresh_exp", ctypes.c_uint16, 4),
     ]
 
 
@@ -306,7 +306,7 @@ class opt4048_reg_flags_bits_t(ctypes.LittleEndianStructure):
 
 
 class opt4048_reg_flags_t(ctypes.Union):
-    _field_ = [
+    _fields_ = [
         ("bits", opt4048_reg_flags_bits_t),
         ("word", ctypes.c_uint16, 16),
     ]
@@ -0,0 +1,498 @@
+# -------------------------------------------------------------------------------
+# opt4048_simulator.py
+#
+# Register-level simulator of the SparkFun Qwiic OPT4048 Tristiumulus Color Sensor.
+# -------------------------------------------------------------------------------
+# Written by SparkFun Electronics, November, 2023 This python library supports the SparkFun Electroncis Qwiic ecosystem
+# More information on Qwiic is at https://www.sparkfun.com/qwiic
+#
+# ===============================================================================
+# Copyright (c) 2023 SparkFun Electronics
+# SPDX-License-Identifier: MIT
+# ===============================================================================
+
+"""
+Simulated OPT4048 for testing and benchmarking without hardware.
+
+Opt4048Simulator implements the readBlock()/writeBlock() interface of the
+qwiic_i2c drivers, so it can be passed as i2c_driver to QwOpt4048. It models:
+
+* the register map of opt4048_registers, with auto-increment bursts,
+* continuous, one-shot and power-down modes, with the quick wake delay,
+* channel conversions timed by the conversion time setting,
+* sample counters, CRCs, manual and automatic range,
+* the FLAGS register, thresholds, fault count and the INT pin,
+* an optional per-transaction bus latency.
+
+The state is advanced lazily whenever the device is accessed. Call start() to
+also advance it in real time, so the INT pin fires without any bus traffic.
+Several simulators can share one SimulatedBus.
+"""
+
+import math
+import random
+import threading
+import time
+
+import qwiic_opt4048
+import opt4048_registers as REGS
+
+# Register values after power-up
+_RESET_VALUES = {
+    REGS.SFE_OPT4048_REGISTER_THRESH_L_EXP_RES: 0x0000,
+    REGS.SFE_OPT4048_REGISTER_THRESH_H_EXP_RES: 0xBFFF,
+    REGS.SFE_OPT4048_REGISTER_CONTROL: 0x3208,
+    REGS.SFE_OPT4048_REGISTER_INT_CONTROL: 0x8011,
+    REGS.SFE_OPT4048_REGISTER_DEVICE_ID: qwiic_opt4048.OPT4048_DEVICE_ID,
+}
+
+_NUM_REGISTERS = REGS.SFE_OPT4048_REGISTER_DEVICE_ID + 1
+
+# Faults needed to raise a threshold flag, indexed by opt4048FaultCountT
+_FAULT_COUNTS = [1, 2, 3, 8]
+
+# Largest exponent the device reports
+_MAX_EXPONENT = 8
+
+# Time to wake from power-down before a one-shot conversion starts, without and
+# with quick wake
+_WAKE_TIME = 0.0005
+_QWAKE_TIME = 0.0
+
+
+class VirtualClock:
+    """
+    Manually advanced clock for deterministic simulations.
+    """
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        """
+        Move the clock forward.
+
+        :param seconds: Time to advance by.
+        :type seconds: float
+        :return: None
+        """
+        self.now += seconds
+
+
+class Opt4048Simulator:
+    """
+    Opt4048Simulator
+    """
+
+    def __init__(
+        self,
+        address=qwiic_opt4048.OPT4048_ADDR_DEF,
+        light=(0, 0, 0, 0),
+        noise=0.0,
+        seed=0,
+        clock=None,
+        latency=None,
+        bus_speed=None,
+    ):
+        """
+        Initialize the Opt4048Simulator class.
+        :param address: I2C address the simulated device answers on.
+        :type address: int
+        :param light: Ideal ADC codes of channels 0 - 3, or a function of time that
+            returns them. See set_light().
+        :param noise: Relative standard deviation of the readings at a 100ms
+            conversion time. It scales with 1/sqrt(conversion time).
+        :type noise: float
+        :param seed: Seed of the noise generator.
+        :type seed: int
+        :param clock: Function returning the current time in seconds. Defaults to
+            time.monotonic. A VirtualClock makes the simulation deterministic.
+        :param latency: Function of the number of bytes moved that returns the
+            duration of a transaction in seconds (optional).
+        :param bus_speed: Bus clock in Hz, used to derive the latency if latency is
+            not given (optional).
+        :type bus_speed: int
+        :return: The Opt4048Simulator object.
+        :rtype: Object
+        """
+        self.address = address
+        self.noise = noise
+        self.clock = clock if clock is not None else time.monotonic
+
+        if latency is None and bus_speed is not None:
+
+            def latency(nbytes):
+                # Address, register and repeated start address bytes plus the
+                # data, nine clocks per byte
+                return (nbytes + 3) * 9 / bus_speed
+
+        self.latency = latency
+
+        # Callback invoked with this simulator whenever the INT pin is asserted
+        self.on_interrupt = None
+
+        self.set_light(light)
+
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._thread = None
+        self._running = False
+
+        self.reset()
+
+    def reset(self):
+        """
+        Put the device back into its power-up state.
+
+        :return: None
+        """
+        with self._lock:
+            self.regs = [0] * _NUM_REGISTERS
+            for register, value in _RESET_VALUES.items():
+                self.regs[register] = value
+
+            # Conversions completed in the current run of conversions
+            self._completed = 0
+            self._run_start = None
+            # Number of conversions of each channel since power-up
+            self._samples = [0, 0, 0, 0]
+            self._faults = 0
+            self.int_asserted = False
+
+    def set_light(self, light):
+        """
+        Set the light falling on the sensor.
+
+        :param light: Ideal ADC codes of channels 0 - 3, or a function of the
+            simulator clock time returning them.
+        :return: None
+        """
+        self._light = light if callable(light) else tuple(light)
+
+    # ---------------------------------------------------------------------------
+    # qwiic_i2c driver interface
+
+    def isDeviceConnected(self, address):
+        return address == self.address
+
+    def ping(self, address):
+        return self.isDeviceConnected(address)
+
+    def readBlock(self, address, commandCode, nBytes):
+        self._check_address(address)
+        self._transaction(nBytes)
+
+        with self._lock:
+            self._update()
+
+            block = []
+            for i in range(nBytes // 2):
+                register = commandCode + i if self._burst else commandCode
+                value = self._read(register)
+                block += [value >> 8, value & 0x00FF]
+
+        return block
+
+    def writeBlock(self, address, commandCode, value):
+        self._check_address(address)
+        self._transaction(len(value))
+
+        with self._lock:
+            self._update()
+
+            for i in range(len(value) // 2):
+                register = commandCode + i if self._burst else commandCode
+                self._write(register, (value[2 * i] << 8) | value[2 * i + 1])
+
+    def _check_address(self, address):
+        if address != self.address:
+            # What smbus raises when nothing acknowledges the address
+            raise OSError(121, "Remote I/O error")
+
+    def _transaction(self, nbytes):
+        if self.latency is None:
+            return
+
+        duration = self.latency(nbytes)
+
+        if hasattr(self.clock, "advance"):
+            self.clock.advance(duration)
+        else:
+            time.sleep(duration)
+
+    # ---------------------------------------------------------------------------
+    # Register access
+
+    @property
+    def _control(self):
+        return self.regs[REGS.SFE_OPT4048_REGISTER_CONTROL]
+
+    @property
+    def _int_control(self):
+        return self.regs[REGS.SFE_OPT4048_REGISTER_INT_CONTROL]
+
+    @property
+    def _burst(self):
+        return self._int_control & 0x0001
+
+    @property
+    def _mode(self):
+        return (self._control & 0x0030) >> 4
+
+    @property
+    def conversion_time(self):
+        """
+        Conversion time of a single channel in seconds.
+        """
+        return qwiic_opt4048._CONVERSION_TIME_SECONDS[(self._control & 0x03C0) >> 6]
+
+    def _read(self, register):
+        if register >= _NUM_REGISTERS:
+            return 0
+
+        value = self.regs[register]
+
+        if register == REGS.SFE_OPT4048_REGISTER_FLAGS:
+            # Reading the flags clears conversion ready, and in latched mode the
+            # threshold flags and the INT pin.
+            self.regs[register] &= ~0x0004
+            if self._control & 0x0008:
+                self.regs[register] &= ~0x0003
+                self.int_asserted = False
+
+        return value
+
+    def _write(self, register, value):
+        if register in (
+            REGS.SFE_OPT4048_REGISTER_THRESH_L_EXP_RES,
+            REGS.SFE_OPT4048_REGISTER_THRESH_H_EXP_RES,
+            REGS.SFE_OPT4048_REGISTER_INT_CONTROL,
+        ):
+            self.regs[register] = value
+        elif register == REGS.SFE_OPT4048_REGISTER_CONTROL:
+            self.regs[register] = value
+            self._start_mode()
+
+    def _start_mode(self):
+        """
+        Restart conversions after CONTROL was written.
+        """
+        mode = self._mode
+        now = self.clock()
+
+        self._completed = 0
+
+        if mode == REGS.opt4048OperationModeT.OPERATION_MODE_POWER_DOWN.value:
+            self._run_start = None
+        elif mode == REGS.opt4048OperationModeT.OPERATION_MODE_CONTINUOUS.value:
+            self._run_start = now
+        else:
+            wake = _QWAKE_TIME if self._control & 0x8000 else _WAKE_TIME
+            self._run_start = now + wake
+
+    # ---------------------------------------------------------------------------
+    # Conversions
+
+    def _update(self):
+        """
+        Complete every conversion that has finished by now.
+        """
+        if self._run_start is None:
+            return
+
+        tconv = self.conversion_time
+        elapsed = self.clock() - self._run_start
+        total = max(int(elapsed / tconv), 0)
+
+        one_shot = self._mode != REGS.opt4048OperationModeT.OPERATION_MODE_CONTINUOUS.value
+        if one_shot:
+            total = min(total, 4)
+
+        # Long gaps only need the last full cycle converted, the counters still
+        # advance by the number of conversions skipped.
+        first = max(self._completed, total - 4)
+        for i in range(self._completed, first):
+            self._samples[i % 4] += 1
+
+        for i in range(first, total):
+            self._convert(i % 4, self._run_start + (i + 1) * tconv)
+
+        self._completed = total
+
+        if one_shot and total == 4:
+            # Back to power-down once the one-shot sequence has finished
+            self.regs[REGS.SFE_OPT4048_REGISTER_CONTROL] &= ~0x0030
+            self._run_start = None
+
+    def _convert(self, channel, when):
+        """
+        Produce the result of one channel conversion finishing at time when.
+        """
+        light = self._light(when) if callable(self._light) else self._light
+        tconv = self.conversion_time
+        code = float(light[channel])
+
+        if self.noise:
+            sigma = self.noise * code * math.sqrt(0.1 / tconv)
+            code += self._random.gauss(0.0, sigma)
+
+        code = max(int(round(code)), 0)
+
+        color_range = (self._control & 0x3C00) >> 10
+        overload = False
+
+        if color_range == REGS.opt4048RangeT.RANGE_AUTO.value:
+            exponent = max(code.bit_length() - 20, 0)
+            if exponent > _MAX_EXPONENT:
+                exponent = _MAX_EXPONENT
+                overload = True
+        else:
+            exponent = min(color_range, _MAX_EXPONENT)
+
+        mantissa = code >> exponent
+        if mantissa > 0xFFFFF:
+            mantissa = 0xFFFFF
+            overload = True
+
+        # Shorter conversions resolve fewer bits, 9 bits at 600us up to all 20
+        # bits at 800ms.
+        dropped = 11 - ((self._control & 0x03C0) >> 6)
+        mantissa &= ~((1 << dropped) - 1)
+
+        self._samples[channel] += 1
+        counter = self._samples[channel] & 0x0F
+        crc = qwiic_opt4048.calc_crc(exponent, mantissa, counter)
+
+        self.regs[2 * channel] = (exponent << 12) | (mantissa >> 8)
+        self.regs[2 * channel + 1] = ((mantissa & 0xFF) << 8) | (counter << 4) | crc
+
+        flags = REGS.SFE_OPT4048_REGISTER_FLAGS
+        if overload:
+            self.regs[flags] |= 0x0008
+        else:
+            self.regs[flags] &= ~0x0008
+
+        self._check_threshold(channel, mantissa << exponent)
+
+        int_cfg = (self._int_control & 0x000C) >> 2
+
+        if channel == 3:
+            self.regs[flags] |= 0x0004
+            if int_cfg == REGS.opt4048IntCFGT.INT_DR_ALL_CHANNELS.value:
+                self._interrupt()
+        elif int_cfg == REGS.opt4048IntCFGT.INT_DR_NEXT_CHANNEL.value:
+            self._interrupt()
+
+    def _check_threshold(self, channel, code):
+        """
+        Compare a result against the thresholds of the selected channel.
+        """
+        if channel != (self._int_control & 0x0060) >> 5:
+            return
+
+        def threshold(register):
+            value = self.regs[register]
+            return (value & 0x0FFF) << (8 + (value >> 12))
+
+        low = threshold(REGS.SFE_OPT4048_REGISTER_THRESH_L_EXP_RES)
+        high = threshold(REGS.SFE_OPT4048_REGISTER_THRESH_H_EXP_RES)
+        flags = REGS.SFE_OPT4048_REGISTER_FLAGS
+        latched = self._control & 0x0008
+
+        if code > high or code < low:
+            self._faults += 1
+        else:
+            self._faults = 0
+            if not latched:
+                self.regs[flags] &= ~0x0003
+
+        if self._faults < _FAULT_COUNTS[self._control & 0x0003]:
+            return
+
+        self.regs[flags] |= 0x0002 if code > high else 0x0001
+
+        if (self._int_control & 0x000C) >> 2 == REGS.opt4048IntCFGT.INT_SMBUS_ALERT.value:
+            self._interrupt()
+
+    def _interrupt(self):
+        self.int_asserted = True
+
+        if self.on_interrupt is not None:
+            self.on_interrupt(self)
+
+    # ---------------------------------------------------------------------------
+    # Real-time operation
+
+    def start(self):
+        """
+        Advance the simulation in real time in a background thread, so the INT pin
+        fires as conversions complete even when nothing reads the device. Only
+        useful with a real-time clock.
+
+        :return: None
+        """
+        if self._thread is not None:
+            return
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the background thread started by start().
+
+        :return: None
+        """
+        self._running = False
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while self._running:
+            with self._lock:
+                self._update()
+
+                if self._run_start is None:
+                    delay = 0.001
+                else:
+                    tconv = self.conversion_time
+                    done = self._run_start + (self._completed + 1) * tconv
+                    delay = done - self.clock()
+
+            time.sleep(min(max(delay, 0.0), 0.01))
+
+
+class SimulatedBus:
+    """
+    I2C bus with several simulated devices on it, dispatched by address.
+    """
+
+    def __init__(self, *devices):
+        """
+        :param devices: Opt4048Simulator objects, each with its own address.
+        """
+        self.devices = {device.address: device for device in devices}
+
+    def _device(self, address):
+        if address not in self.devices:
+            raise OSError(121, "Remote I/O error")
+
+        return self.devices[address]
+
+    def isDeviceConnected(self, address):
+        return address in self.devices
+
+    def ping(self, address):
+        return self.isDeviceConnected(address)
+
+    def readBlock(self, address, commandCode, nBytes):
+        return self._device(address).readBlock(address, commandCode, nBytes)
+
+    def writeBlock(self, address, commandCode, value):
+        self._device(address).writeBlock(address, commandCode, value)
@@ -16,9 +16,15 @@
 # SPDX-License-Identifier: MIT
 # ===============================================================================
 
-from dataclasses import dataclass
+from contextlib import contextmanager
+from dataclasses import dataclass, field, fields
+from enum import Enum
+from functools import cached_property
+import struct
+import time
 import qwiic_i2c
 import opt4048_registers as REGS
+import opt4048_cct
 
 OPT4048_ADDR_HIGH = 0x45
 OPT4048_ADDR_SCL = 0x45
@@ -30,6 +36,105 @@ OPT4048_DEVICE_ID = 0x821
 _DEFAULT_NAME = "Qwiic OPT4048 Color Sensor"
 _AVAILABLE_I2C_ADDRESS = [OPT4048_ADDR_LOW, OPT4048_ADDR_HIGH, OPT4048_ADDR_SDA]
 
+# Conversion time of a single channel in seconds, indexed by opt4048ConversionTimeT
+_CONVERSION_TIME_SECONDS = [
+    0.0006,
+    0.001,
+    0.0018,
+    0.0034,
+    0.0065,
+    0.0127,
+    0.025,
+    0.05,
+    0.1,
+    0.2,
+    0.4,
+    0.8,
+]
+
+# Bits of the FLAGS register
+_FLAG_CONV_READY = 0x0004
+
+# Time the device needs to wake from power-down before a one-shot conversion
+# starts, unless quick wake keeps it partly powered.
+_WAKE_TIME_SECONDS = 0.0005
+
+# How measure_once() waits for the conversion
+OPT4048_WAIT_TIMER = 0  # Sleep for the expected conversion time
+OPT4048_WAIT_FLAG = 1  # Poll the conversion ready flag
+
+# What to do when the CRC of a channel result doesn't match
+OPT4048_CRC_IGNORE = 0  # Don't check the CRC
+OPT4048_CRC_MARK = 1  # Mark the sample as invalid
+OPT4048_CRC_RAISE = 2  # Raise Opt4048CrcError
+OPT4048_CRC_RETRY = 3  # Re-read the burst, raise once the retries run out
+
+
+class Opt4048CrcError(IOError):
+    """
+    Raised when a channel result read from the OPT4048 fails its CRC check.
+    """
+
+    def __init__(self, channels):
+        super().__init__("CRC mismatch on channel(s) %s" % list(channels))
+        self.channels = channels
+
+
+# The datasheet defines the 4-bit CRC over the exponent E[3:0], the mantissa
+# R[19:0] and the sample counter C[3:0]. Packed into one word as E:R:C, each CRC
+# bit is the parity of a fixed set of bits:
+#   CRC[0] = all bits
+#   CRC[1] = C[1], C[3], R[1], R[3], ... R[19], E[1], E[3] (every odd bit)
+#   CRC[2] = C[3], R[3], R[7], R[11], R[15], R[19], E[3]
+#   CRC[3] = R[3], R[11], R[19]
+_CRC_MASKS = [0x0FFFFFFF, 0x0AAAAAAA, 0x08888888, 0x00808080]
+
+
+def _build_crc_tables():
+    """
+    Precompute the CRC contribution of every byte value at every byte position of
+    the packed word, so a CRC costs four lookups.
+    """
+    tables = []
+
+    for shift in (0, 8, 16, 24):
+        table = []
+        for byte in range(256):
+            crc = 0
+            for bit, mask in enumerate(_CRC_MASKS):
+                crc |= (bin((byte << shift) & mask).count("1") & 1) << bit
+            table.append(crc)
+        tables.append(table)
+
+    return tables
+
+
+_CRC_TABLES = _build_crc_tables()
+
+
+def calc_crc(exponent, mantissa, counter):
+    """
+    Calculate the CRC of a channel result as defined in the OPT4048 datasheet.
+
+    :param exponent: 4-bit result exponent.
+    :type exponent: int
+    :param mantissa: 20-bit result mantissa.
+    :type mantissa: int
+    :param counter: 4-bit sample counter.
+    :type counter: int
+    :return: 4-bit CRC.
+    :rtype: int
+    """
+    word = (exponent << 24) | (mantissa << 4) | counter
+    t0, t1, t2, t3 = _CRC_TABLES
+
+    return (
+        t0[word & 0xFF]
+        ^ t1[(word >> 8) & 0xFF]
+        ^ t2[(word >> 16) & 0xFF]
+        ^ t3[(word >> 24) & 0x0F]
+    )
+
 
 @dataclass
 class sfe_color_t:
@@ -49,6 +154,289 @@ class sfe_color_t:
     CRCG: int = 0
     CRCB: int = 0
     CRCW: int = 0
+    valid: bool = True
+
+
+def _calc_xyz(red, green, blue, cie_matrix):
+    """
+    Convert channel ADC codes to CIE XYZ using the OPT4048 matrix.
+    """
+    x, y, z = 0, 0, 0
+
+    for row in cie_matrix:
+        x += red * row[0]
+        y += green * row[1]
+        z += blue * row[2]
+
+    return x, y, z
+
+
+@dataclass(frozen=True)
+class sfe_measurement_t:
+    """
+    Immutable snapshot of all four OPT4048 channels taken from a single burst read.
+    The color values are derived from the raw codes when first accessed and then
+    memoized, so unused values cost nothing.
+    """
+
+    codes: tuple = (0, 0, 0, 0)
+    exponents: tuple = (0, 0, 0, 0)
+    counters: tuple = (0, 0, 0, 0)
+    crcs: tuple = (0, 0, 0, 0)
+    timestamp: float = 0.0
+    valid: bool = True
+    missed: int = 0
+    # Time from triggering the conversion to having the data, set by measure_once()
+    latency: float = 0.0
+    # Number of channels read, counting from channel 0. The others read as zero.
+    channels: int = 4
+    cie_matrix: list = field(default=None, repr=False, compare=False)
+    cct_algorithm: int = field(
+        default=opt4048_cct.CCT_MCCAMY, repr=False, compare=False
+    )
+
+    @property
+    def red(self):
+        return self.codes[0]
+
+    @property
+    def green(self):
+        return self.codes[1]
+
+    @property
+    def blue(self):
+        return self.codes[2]
+
+    @property
+    def white(self):
+        return self.codes[3]
+
+    @cached_property
+    def XYZ(self):
+        """
+        CIE XYZ tristimulus values, None unless channels 0 - 2 were read.
+        """
+        if self.channels < 3:
+            return None
+
+        return _calc_xyz(self.codes[0], self.codes[1], self.codes[2], self.cie_matrix)
+
+    @cached_property
+    def CIEx(self):
+        """
+        CIE x chromaticity coordinate, 0 when there is no light and None unless
+        channels 0 - 2 were read.
+        """
+        if self.XYZ is None:
+            return None
+
+        x, y, z = self.XYZ
+
+        if (x + y + z) == 0:
+            return 0
+
+        # Calculate the CIE x value, all of the
+        # math required to do this is in the datasheet.
+        return x / (x + y + z)
+
+    @cached_property
+    def CIEy(self):
+        """
+        CIE y chromaticity coordinate, 0 when there is no light and None unless
+        channels 0 - 2 were read.
+        """
+        if self.XYZ is None:
+            return None
+
+        x, y, z = self.XYZ
+
+        if (x + y + z) == 0:
+            return 0
+
+        # Calculate the CIE y value, all of the
+        # math required to do this is in the datasheet.
+        return y / (x + y + z)
+
+    @cached_property
+    def lux(self):
+        """
+        Illuminance in lux, derived from channel 1. None unless it was read.
+        """
+        if self.channels < 2:
+            return None
+
+        return self.codes[1] * self.cie_matrix[1][3]
+
+    @cached_property
+    def CCT(self):
+        """
+        Correlated color temperature in Kelvin using cct_algorithm, 0 when there is
+        no light and None unless channels 0 - 2 were read.
+        """
+        if self.XYZ is None:
+            return None
+
+        if sum(self.XYZ) == 0:
+            return 0
+
+        if self.cct_algorithm == opt4048_cct.CCT_ROBERTSON:
+            return self._cct_duv[0]
+
+        return opt4048_cct.cct(self.CIEx, self.CIEy, self.cct_algorithm)
+
+    @cached_property
+    def Duv(self):
+        """
+        Distance from the Planckian locus in CIE 1960 u/v, positive above it. Always
+        computed with Robertson's method, 0 when there is no light and None unless
+        channels 0 - 2 were read.
+        """
+        if self.XYZ is None:
+            return None
+
+        if sum(self.XYZ) == 0:
+            return 0
+
+        return self._cct_duv[1]
+
+    @cached_property
+    def _cct_duv(self):
+        return opt4048_cct.cct_duv(self.CIEx, self.CIEy)
+
+
+@dataclass
+class sfe_config_t:
+    """
+    Dataclass for collecting configuration changes for the OPT4048. Fields left
+    as None keep their current device setting. Enum members from
+    opt4048_registers or their integer values are both accepted.
+    """
+
+    range: REGS.opt4048RangeT = None
+    conversion_time: REGS.opt4048ConversionTimeT = None
+    operation_mode: REGS.opt4048OperationModeT = None
+    qwake: bool = None
+    int_latch: bool = None
+    int_active_high: bool = None
+    fault_count: REGS.opt4048FaultCountT = None
+    threshold_channel: REGS.opt4048ThresholdChannelT = None
+    int_input: bool = None
+    int_mechanism: REGS.opt4048IntCFGT = None
+    i2c_burst: bool = None
+
+
+# Register, mask and shift of every sfe_config_t field.
+_CONFIG_FIELDS = {
+    "range": (REGS.SFE_OPT4048_REGISTER_CONTROL, 0x3C00, 10),
+    "conversion_time": (REGS.SFE_OPT4048_REGISTER_CONTROL, 0x03C0, 6),
+    "operation_mode": (REGS.SFE_OPT4048_REGISTER_CONTROL, 0x0030, 4),
+    "qwake": (REGS.SFE_OPT4048_REGISTER_CONTROL, 0x8000, 15),
+    "int_latch": (REGS.SFE_OPT4048_REGISTER_CONTROL, 0x0008, 3),
+    "int_active_high": (REGS.SFE_OPT4048_REGISTER_CONTROL, 0x0004, 2),
+    "fault_count": (REGS.SFE_OPT4048_REGISTER_CONTROL, 0x0003, 0),
+    "threshold_channel": (REGS.SFE_OPT4048_REGISTER_INT_CONTROL, 0x0060, 5),
+    "int_input": (REGS.SFE_OPT4048_REGISTER_INT_CONTROL, 0x0010, 4),
+    "int_mechanism": (REGS.SFE_OPT4048_REGISTER_INT_CONTROL, 0x000C, 2),
+    "i2c_burst": (REGS.SFE_OPT4048_REGISTER_INT_CONTROL, 0x0001, 0),
+}
+
+# Registers 0x00 - 0x07 hold two words per channel:
+#   EXP_RES_CHn:     exponent[15:12], result_msb[11:0]
+#   RES_CNT_CRC_CHn: result_lsb[15:8], counter[7:4], crc[3:0]
+# The ctypes unions in opt4048_registers describe the same layout, but building
+# them for every read is far slower than unpacking the words directly.
+_CHANNEL_WORDS = struct.Struct(">2H")
+_BURST_WORDS = struct.Struct(">8H")
+
+
+def decode_channel(buff):
+    """
+    Decode the 4 bytes of a single channel's result registers.
+
+    :param buff: Bytes read from EXP_RES_CHn.
+    :return: ADC code, exponent, mantissa, counter and CRC.
+    :rtype: tuple
+    """
+    hi, lo = _CHANNEL_WORDS.unpack_from(bytes(buff))
+
+    exponent = hi >> 12
+    mantissa = ((hi & 0x0FFF) << 8) | (lo >> 8)
+
+    return mantissa << exponent, exponent, mantissa, (lo >> 4) & 0x0F, lo & 0x0F
+
+
+def decode_burst(buff):
+    """
+    Decode the 16 bytes of all four channels' result registers.
+
+    :param buff: Bytes read from EXP_RES_CH0.
+    :return: ADC codes, exponents, mantissas, counters and CRCs, one tuple of four
+        channels per field.
+    :rtype: tuple
+    """
+    w = _BURST_WORDS.unpack_from(bytes(buff))
+
+    e0, e1, e2, e3 = w[0] >> 12, w[2] >> 12, w[4] >> 12, w[6] >> 12
+    m0 = ((w[0] & 0x0FFF) << 8) | (w[1] >> 8)
+    m1 = ((w[2] & 0x0FFF) << 8) | (w[3] >> 8)
+    m2 = ((w[4] & 0x0FFF) << 8) | (w[5] >> 8)
+    m3 = ((w[6] & 0x0FFF) << 8) | (w[7] >> 8)
+
+    return (
+        (m0 << e0, m1 << e1, m2 << e2, m3 << e3),
+        (e0, e1, e2, e3),
+        (m0, m1, m2, m3),
+        (
+            (w[1] >> 4) & 0x0F,
+            (w[3] >> 4) & 0x0F,
+            (w[5] >> 4) & 0x0F,
+            (w[7] >> 4) & 0x0F,
+        ),
+        (w[1] & 0x0F, w[3] & 0x0F, w[5] & 0x0F, w[7] & 0x0F),
+    )
+
+
+def encode_threshold(code):
+    """
+    Encode an ADC code as a threshold register value. The device compares each
+    result with result << (8 + exponent) of the threshold, so the smallest
+    exponent that fits the 12-bit result is used to keep the most precision.
+
+    :param code: Threshold in ADC codes.
+    :type code: int
+    :return: Threshold register value, exponent[15:12] and result[11:0].
+    :rtype: int
+    """
+    code = max(int(round(code)), 0)
+
+    for exponent in range(16):
+        result = (code + (1 << (7 + exponent))) >> (8 + exponent)
+        if result <= 0x0FFF:
+            return (exponent << 12) | result
+
+    return 0xFFFF
+
+
+def decode_threshold(value):
+    """
+    Decode a threshold register value into ADC codes.
+
+    :param value: Threshold register value.
+    :type value: int
+    :return: Threshold in ADC codes.
+    :rtype: int
+    """
+    return (value & 0x0FFF) << (8 + (value >> 12))
+
+
+def _enum_value(value):
+    """
+    Return the integer behind a register setting, which may be an Enum member.
+    """
+    if isinstance(value, Enum):
+        return value.value
+
+    return int(value)
 
 
 class QwOpt4048:
@@ -70,17 +458,60 @@ class QwOpt4048:
     OPT_MATRIX_ROWS = 4
     OPT_MATRIX_COLS = 4
 
-    def __init__(self, address=None, i2c_driver=None):
+    # The threshold, control and interrupt control registers only change when the
+    # host writes them, so these are the registers the shadow cache may hold. The
+    # one exception is the operating mode in CONTROL, which the device sets back
+    # to power-down after a one-shot conversion, see _cache_register().
+    SHADOW_REGISTERS = range(
+        REGS.SFE_OPT4048_REGISTER_THRESH_L_EXP_RES,
+        REGS.SFE_OPT4048_REGISTER_INT_CONTROL + 1,
+    )
+
+    def __init__(self, address=None, i2c_driver=None, shadow_cache=False):
         """
         Initialize the QwOpt4048 device class.
         :param address: The I2C address to use for the device.
         :param i2c_driver: An existing i2c driver object to use (optional).
+        :param shadow_cache: Keep a local copy of registers 0x08 - 0x0B so setters
+            only write to the device and getters don't touch the bus. One-shot
+            modes are cached as the power-down the device returns to (optional).
         :return: The QwOpt4048 device object.
         :rtype: Object
         """
         # Did the user specify an I2C address?
         self.address = self.available_addresses[0] if address is None else address
 
+        self.shadow_cache = shadow_cache
+        self._shadow = {}
+
+        # CRC checking of channel results, see the OPT4048_CRC_* constants
+        self.crc_policy = OPT4048_CRC_MARK
+        self.crc_retries = 3
+        self.crc_errors = [0, 0, 0, 0]
+
+        # Sample counters of the last measurement, for spotting new conversions
+        self._last_counters = None
+
+        # Each channel has its own sample counter, and a CONTROL write restarts the
+        # conversions at channel 0, so the counters of a complete conversion only
+        # keep fixed offsets from each other until the next CONTROL write. These
+        # are the offsets of channels 0 - 2 from channel 3, None until known.
+        self._frame_offsets = None
+        # Channel 3 counter and offsets of a conversion read_if_new() held back
+        # until the next one confirms them, and the channel 3 counter and time of
+        # its last read
+        self._held = None
+        self._probe = None
+        # Sample counters of the channels a partial measure_once() read
+        self._once_counters = None
+
+        # Algorithm used for CCT, one of the opt4048_cct.CCT_* constants
+        self.cct_algorithm = opt4048_cct.CCT_MCCAMY
+
+        # Observed time to conversion ready relative to the expected time, used to
+        # place the first poll of wait_for_conversion()
+        self._ready_ratio = 1.0
+
         # load the I2C driver if one isn't provided
         if i2c_driver is None:
             self._i2c = qwiic_i2c.getI2CDriver()
@@ -98,7 +529,7 @@ class QwOpt4048:
         :rtype: bool
 
         """
-        return qwiic_i2c.isDeviceConnected(self.address)
+        return self._i2c.isDeviceConnected(self.address)
 
     connected = property(is_connected)
 
@@ -113,8 +544,193 @@ class QwOpt4048:
         if self.get_device_id() != OPT4048_DEVICE_ID:
             return False
 
+        if self.shadow_cache:
+            self.refresh()
+
         return True
 
+    def refresh(self):
+        """
+        Reload the shadow cache from the device with a single burst read of
+        registers 0x08 - 0x0B. Call this if something other than this object
+        may have changed the device configuration.
+
+        :return: None
+        """
+        if not self.shadow_cache:
+            return
+
+        self._shadow.clear()
+        self.get_config_registers()
+
+    def get_config_registers(self):
+        """
+        Return the raw threshold and control registers 0x08 - 0x0B, read with a
+        single burst unless they are all in the shadow cache. Without the shadow
+        cache INT_CONTROL is read first, as its I2C burst setting decides whether
+        the device auto-increments, and with it off each register is read on its
+        own.
+
+        :return: THRESH_L, THRESH_H, CONTROL and INT_CONTROL register values.
+        :rtype: tuple
+        """
+        if self.shadow_cache and all(r in self._shadow for r in self.SHADOW_REGISTERS):
+            return tuple(self._shadow[r] for r in self.SHADOW_REGISTERS)
+
+        if not self.get_i2c_burst():
+            return tuple(self._read_register(r) for r in self.SHADOW_REGISTERS)
+
+        block = self._i2c.readBlock(
+            self.address,
+            REGS.SFE_OPT4048_REGISTER_THRESH_L_EXP_RES,
+            2 * len(self.SHADOW_REGISTERS),
+        )
+
+        values = tuple(
+            (block[2 * i] << 8) | block[2 * i + 1]
+            for i in range(len(self.SHADOW_REGISTERS))
+        )
+
+        if self.shadow_cache:
+            for register, value in zip(self.SHADOW_REGISTERS, values):
+                self._cache_register(register, value)
+
+        return values
+
+    def invalidate(self):
+        """
+        Drop the shadow cache. The next access to each register goes to the bus
+        and repopulates its cached value.
+
+        :return: None
+        """
+        self._shadow.clear()
+
+    def _cache_register(self, register, value):
+        """
+        Store a register value in the shadow cache. The device clears the mode bits
+        of CONTROL once a one-shot conversion is done, so a one-shot mode is stored
+        as power-down. Otherwise the next read-modify-write of CONTROL would write
+        the one-shot mode back and silently start another conversion.
+
+        :param register: Register address.
+        :type register: int
+        :param value: Register value.
+        :type value: int
+        :return: None
+        """
+        if register == REGS.SFE_OPT4048_REGISTER_CONTROL and value & 0x0030 in (
+            REGS.opt4048OperationModeT.OPERATION_MODE_AUTO_ONE_SHOT.value << 4,
+            REGS.opt4048OperationModeT.OPERATION_MODE_ONE_SHOT.value << 4,
+        ):
+            value &= ~0x0030
+
+        self._shadow[register] = value
+
+    def _read_register(self, register):
+        """
+        Read a single 16-bit register, served from the shadow cache when possible.
+
+        :param register: Register address.
+        :type register: int
+        :return: Register value.
+        :rtype: int
+        """
+        if self.shadow_cache and register in self._shadow:
+            return self._shadow[register]
+
+        block = self._i2c.readBlock(self.address, register, 2)
+
+        value = (block[0] << 8) | block[1]
+
+        if self.shadow_cache and register in self.SHADOW_REGISTERS:
+            self._cache_register(register, value)
+
+        return value
+
+    def _write_register(self, register, value):
+        """
+        Write a single 16-bit register and keep the shadow cache in step.
+
+        :param register: Register address.
+        :type register: int
+        :param value: Register value.
+        :type value: int
+        :return: None
+        """
+        self._i2c.writeBlock(self.address, register, [value >> 8, value & 0x00FF])
+
+        if register == REGS.SFE_OPT4048_REGISTER_CONTROL:
+            self._restarted()
+
+        if self.shadow_cache and register in self.SHADOW_REGISTERS:
+            self._cache_register(register, value)
+
+    def _write_registers(self, first, values, burst=None):
+        """
+        Write consecutive 16-bit registers, in one transaction if the device
+        auto-increments the register address, otherwise one transaction per
+        register. The shadow cache is kept in step.
+
+        :param first: Address of the first register.
+        :type first: int
+        :param values: Register values.
+        :type values: list
+        :param burst: The current I2C burst setting, read from INT_CONTROL if None.
+        :type burst: bool
+        :return: None
+        """
+        if burst is None:
+            burst = self.get_i2c_burst()
+
+        if not burst:
+            for i, value in enumerate(values):
+                self._write_register(first + i, value)
+            return
+
+        block = []
+        for value in values:
+            block += [value >> 8, value & 0x00FF]
+
+        self._i2c.writeBlock(self.address, first, block)
+
+        if first <= REGS.SFE_OPT4048_REGISTER_CONTROL < first + len(values):
+            self._restarted()
+
+        if self.shadow_cache:
+            for i, value in enumerate(values):
+                if first + i in self.SHADOW_REGISTERS:
+                    self._cache_register(first + i, value)
+
+    def _restarted(self):
+        """
+        Note a CONTROL write: the device restarts its conversions at channel 0, so
+        the counter offsets of a complete conversion have to be learned again.
+
+        :return: None
+        """
+        self._frame_offsets = None
+        self._held = None
+
+    def _update_register(self, register, mask, value):
+        """
+        Replace the bits selected by mask in a register. With the shadow cache
+        enabled this is a single write, otherwise a read-modify-write.
+
+        :param register: Register address.
+        :type register: int
+        :param mask: Bits of the register to replace.
+        :type mask: int
+        :param value: New value for the masked bits, already shifted into place.
+        :type value: int
+        :return: None
+        """
+        reg = self._read_register(register)
+        reg &= ~mask
+        reg |= value & mask
+
+        self._write_register(register, reg)
+
     def get_device_id(self):
         """
         Retrieve the unique device ID of the OPT4048.
@@ -122,11 +738,7 @@ class QwOpt4048:
         :return: Unique device ID.
         :rtype: int
         """
-        block = self._i2c.readBlock(
-            self.address, REGS.SFE_OPT4048_REGISTER_DEVICE_ID, 2
-        )
-
-        unique_id = (block[0] << 8) | block[1]
+        unique_id = self._read_register(REGS.SFE_OPT4048_REGISTER_DEVICE_ID)
 
         return unique_id
 
@@ -139,14 +751,83 @@ class QwOpt4048:
 
         :return: None
         """
-        self.set_range(REGS.opt4048RangeT.RANGE_AUTO.value)
-        self.set_conversion_time(
-            REGS.opt4048ConversionTimeT.CONVERSION_TIME_200MS.value
+        self.apply_config(
+            sfe_config_t(
+                range=REGS.opt4048RangeT.RANGE_AUTO,
+                conversion_time=REGS.opt4048ConversionTimeT.CONVERSION_TIME_200MS,
+                operation_mode=REGS.opt4048OperationModeT.OPERATION_MODE_CONTINUOUS,
+            )
         )
-        self.set_operation_mode(
-            REGS.opt4048OperationModeT.OPERATION_MODE_CONTINUOUS.value
+
+    def apply_config(self, config):
+        """
+        Apply every field set in config with at most one burst write starting at the
+        CONTROL register. Nothing is written if the device already holds the
+        requested settings. With the I2C burst setting off, each changed register is
+        written on its own.
+
+        :param config: The configuration changes to apply.
+        :type config: sfe_config_t
+        :return: True if the device was written, otherwise False.
+        :rtype: bool
+        """
+        control = REGS.SFE_OPT4048_REGISTER_CONTROL
+        int_control = REGS.SFE_OPT4048_REGISTER_INT_CONTROL
+
+        # Read one at a time: whether the device auto-increments depends on the
+        # I2C burst bit of INT_CONTROL itself. Free with the shadow cache.
+        current = {
+            int_control: self._read_register(int_control),
+            control: self._read_register(control),
+        }
+
+        words = dict(current)
+
+        for config_field in fields(config):
+            value = getattr(config, config_field.name)
+            if value is None:
+                continue
+
+            register, mask, shift = _CONFIG_FIELDS[config_field.name]
+            words[register] &= ~mask
+            words[register] |= (_enum_value(value) << shift) & mask
+
+        changed = [reg for reg in (control, int_control) if words[reg] != current[reg]]
+
+        if not changed:
+            return False
+
+        # Only the registers that changed are written, both together in one
+        # auto-increment burst if needed.
+        first = changed[0]
+        self._write_registers(
+            first,
+            [words[register] for register in range(first, changed[-1] + 1)],
+            burst=current[int_control] & 0x0001,
         )
 
+        return True
+
+    @contextmanager
+    def configure(self):
+        """
+        Collect configuration changes and apply them together on exit, e.g.::
+
+            with sensor.configure() as cfg:
+                cfg.range = opt4048RangeT.RANGE_AUTO
+                cfg.conversion_time = opt4048ConversionTimeT.CONVERSION_TIME_1MS
+
+        Nothing is written if the block raises.
+
+        :return: A configuration object to fill in.
+        :rtype: sfe_config_t
+        """
+        config = sfe_config_t()
+
+        yield config
+
+        self.apply_config(config)
+
     def set_range(self, color_range):
         """
         Set the range of the OPT4048.
@@ -155,16 +836,9 @@ class QwOpt4048:
         :type range: REGS.opt4048RangeT
         :return: None
         """
-        block = self._i2c.readBlock(self.address, REGS.SFE_OPT4048_REGISTER_CONTROL, 2)
-
-        control_reg = (block[0] << 8) | block[1]
-        control_reg &= ~0x3C00
-        control_reg |= color_range << 10
-
-        block[0] = control_reg >> 8
-        block[1] = control_reg & 0x00FF
-
-        self._i2c.writeBlock(self.address, REGS.SFE_OPT4048_REGISTER_CONTROL, block)
+        self._update_register(
+            REGS.SFE_OPT4048_REGISTER_CONTROL, 0x3C00, color_range << 10
+        )
 
     def get_range(self):
         """
@@ -173,9 +847,7 @@ class QwOpt4048:
         :return: Current range setting.
         :rtype: REGS.opt4048RangeT
         """
-        block = self._i2c.readBlock(self.address, REGS.SFE_OPT4048_REGISTER_CONTROL, 2)
-
-        control_reg = (block[0] << 8) | block[1]
+        control_reg = self._read_register(REGS.SFE_OPT4048_REGISTER_CONTROL)
 
         return (control_reg & 0x3C00) >> 10
 
@@ -188,20 +860,7 @@ class QwOpt4048:
         :return: None
         """
 
-        block = self._i2c.readBlock(self.address, REGS.SFE_OPT4048_REGISTER_CONTROL, 2)
-
-        control_reg = (block[0] << 8) | block[1]
-        control_reg &= ~0x03C0
-        control_reg |= time << 6
-
-        block[0] = control_reg >> 8
-        block[1] = control_reg & 0x00FF
-
-        self._i2c.writeBlock(
-            self.address,
-            REGS.SFE_OPT4048_REGISTER_CONTROL,
-            block,
-        )
+        self._update_register(REGS.SFE_OPT4048_REGISTER_CONTROL, 0x03C0, time << 6)
 
     def get_conversion_time(self):
         """
@@ -211,9 +870,7 @@ class QwOpt4048:
         :rtype: int
         """
 
-        block = self._i2c.readBlock(self.address, REGS.SFE_OPT4048_REGISTER_CONTROL, 2)
-
-        control_reg = (block[0] << 8) | block[1]
+        control_reg = self._read_register(REGS.SFE_OPT4048_REGISTER_CONTROL)
 
         return (control_reg & 0x03C0) >> 6
 
@@ -225,20 +882,7 @@ class QwOpt4048:
         :type enable: bool
         """
 
-        block = self._i2c.readBlock(self.address, REGS.SFE_OPT4048_REGISTER_CONTROL, 2)
-
-        control_reg = (block[0] << 8) | block[1]
-        control_reg &= ~0x8000
-        control_reg |= enable << 15
-
-        block[0] = control_reg >> 8
-        block[1] = control_reg & 0x00FF
-
-        self._i2c.writeBlock(
-            self.address,
-            REGS.SFE_OPT4048_REGISTER_CONTROL,
-            block,
-        )
+        self._update_register(REGS.SFE_OPT4048_REGISTER_CONTROL, 0x8000, enable << 15)
 
     def get_qwake(self):
         """
@@ -247,9 +891,7 @@ class QwOpt4048:
         :return: Quick wake bit.
         :rtype: int
         """
-        block = self._i2c.readBlock(self.address, REGS.SFE_OPT4048_REGISTER_CONTROL, 2)
-
-        control_reg = (block[0] << 8) | block[1]
+        control_reg = self._read_register(REGS.SFE_OPT4048_REGISTER_CONTROL)
 
         return (control_reg & 0x8000) >> 15
 
@@ -261,20 +903,7 @@ class QwOpt4048:
         :return: None
         """
 
-        block = self._i2c.readBlock(self.address, REGS.SFE_OPT4048_REGISTER_CONTROL, 2)
-
-        control_reg = (block[0] << 8) | block[1]
-        control_reg &= ~0x0030
-        control_reg |= mode << 4
-
-        block[0] = control_reg >> 8
-        block[1] = control_reg & 0x00FF
-
-        self._i2c.writeBlock(
-            self.address,
-            REGS.SFE_OPT4048_REGISTER_CONTROL,
-            block,
-        )
+        self._update_register(REGS.SFE_OPT4048_REGISTER_CONTROL, 0x0030, mode << 4)
 
     def get_operation_mode(self):
         """
@@ -282,9 +911,7 @@ class QwOpt4048:
         :return: Current operation mode.
         :rtype: int
         """
-        block = self._i2c.readBlock(self.address, REGS.SFE_OPT4048_REGISTER_CONTROL, 2)
-
-        control_reg = (block[0] << 8) | block[1]
+        control_reg = self._read_register(REGS.SFE_OPT4048_REGISTER_CONTROL)
 
         return (control_reg & 0x0030) >> 4
 
@@ -296,20 +923,7 @@ class QwOpt4048:
         :type enable: bool
         :return: None
         """
-        block = self._i2c.readBlock(self.address, REGS.SFE_OPT4048_REGISTER_CONTROL, 2)
-
-        control_reg = (block[0] << 8) | block[1]
-        control_reg &= ~0x0008
-        control_reg |= enable << 3
-
-        block[0] = control_reg >> 8
-        block[1] = control_reg & 0x00FF
-
-        self._i2c.writeBlock(
-            self.address,
-            REGS.SFE_OPT4048_REGISTER_CONTROL,
-            block,
-        )
+        self._update_register(REGS.SFE_OPT4048_REGISTER_CONTROL, 0x0008, enable << 3)
 
     def get_int_latch(self):
         """
@@ -318,9 +932,7 @@ class QwOpt4048:
         :return: Interrupt latch.
         :rtype: bool
         """
-        block = self._i2c.readBlock(self.address, REGS.SFE_OPT4048_REGISTER_CONTROL, 2)
-
-        control_reg = (block[0] << 8) | block[1]
+        control_reg = self._read_register(REGS.SFE_OPT4048_REGISTER_CONTROL)
 
         return control_reg & 0x0008
 
@@ -331,20 +943,7 @@ class QwOpt4048:
         :type enable: bool
         :return: None
         """
-        block = self._i2c.readBlock(self.address, REGS.SFE_OPT4048_REGISTER_CONTROL, 2)
-
-        control_reg = (block[0] << 8) | block[1]
-        control_reg &= ~0x0004
-        control_reg |= enable << 2
-
-        block[0] = control_reg >> 8
-        block[1] = control_reg & 0x00FF
-
-        self._i2c.writeBlock(
-            self.address,
-            REGS.SFE_OPT4048_REGISTER_CONTROL,
-            block,
-        )
+        self._update_register(REGS.SFE_OPT4048_REGISTER_CONTROL, 0x0004, enable << 2)
 
     def get_int_active_high(self):
         """
@@ -352,9 +951,7 @@ class QwOpt4048:
         :return: Interrupt polarity.
         :rtype: bool
         """
-        block = self._i2c.readBlock(self.address, REGS.SFE_OPT4048_REGISTER_CONTROL, 2)
-
-        control_reg = (block[0] << 8) | block[1]
+        control_reg = self._read_register(REGS.SFE_OPT4048_REGISTER_CONTROL)
 
         return (control_reg & 0x0004) >> 2
 
@@ -364,21 +961,8 @@ class QwOpt4048:
         :param enable: Enable or disable interrupt input.
         :type enable: bool
         """
-        block = self._i2c.readBlock(
-            self.address, REGS.SFE_OPT4048_REGISTER_INT_CONTROL, 2
-        )
-
-        int_control_reg = (block[0] << 8) | block[1]
-        int_control_reg &= ~0x0010
-        int_control_reg |= enable << 4
-
-        block[0] = int_control_reg >> 8
-        block[1] = int_control_reg & 0x00FF
-
-        self._i2c.writeBlock(
-            self.address,
-            REGS.SFE_OPT4048_REGISTER_INT_CONTROL,
-            block,
+        self._update_register(
+            REGS.SFE_OPT4048_REGISTER_INT_CONTROL, 0x0010, enable << 4
         )
 
     def get_int_input_enable(self):
@@ -387,11 +971,7 @@ class QwOpt4048:
         :return: Interrupt input.
         :rtype: bool
         """
-        block = self._i2c.readBlock(
-            self.address, REGS.SFE_OPT4048_REGISTER_INT_CONTROL, 2
-        )
-
-        int_control_reg = (block[0] << 8) | block[1]
+        int_control_reg = self._read_register(REGS.SFE_OPT4048_REGISTER_INT_CONTROL)
 
         return (int_control_reg & 0x0010) >> 4
 
@@ -403,21 +983,8 @@ class QwOpt4048:
         :type enable: bool
         :return: None
         """
-        block = self._i2c.readBlock(
-            self.address, REGS.SFE_OPT4048_REGISTER_INT_CONTROL, 2
-        )
-
-        int_control_reg = (block[0] << 8) | block[1]
-        int_control_reg &= ~0x000C
-        int_control_reg |= mechanism << 2
-
-        block[0] = int_control_reg >> 8
-        block[1] = int_control_reg & 0x00FF
-
-        self._i2c.writeBlock(
-            self.address,
-            REGS.SFE_OPT4048_REGISTER_INT_CONTROL,
-            block,
+        self._update_register(
+            REGS.SFE_OPT4048_REGISTER_INT_CONTROL, 0x000C, mechanism << 2
         )
 
     def get_int_mechanism(self):
@@ -427,11 +994,7 @@ class QwOpt4048:
         :return: Interrupt mechanism.
         :rtype: int
         """
-        block = self._i2c.readBlock(
-            self.address, REGS.SFE_OPT4048_REGISTER_INT_CONTROL, 2
-        )
-
-        int_control_reg = (block[0] << 8) | block[1]
+        int_control_reg = self._read_register(REGS.SFE_OPT4048_REGISTER_INT_CONTROL)
 
         return (int_control_reg & 0x000C) >> 2
 
@@ -451,11 +1014,7 @@ class QwOpt4048:
         :return: Flag that indicates the ADC is overloaded.
         :rtype: bool
         """
-        flag_reg = REGS.opt4048_reg_flags_t()
-
-        flag_reg.word = self.get_all_flags()
-
-        return flag_reg.bits.overload_flag
+        return (self.get_all_flags() >> 3) & 1
 
     def get_conv_ready_flag(self):
         """
@@ -463,11 +1022,7 @@ class QwOpt4048:
         :return: Flag that indicates a conversion is ready to be read.
         :rtype: bool
         """
-        flag_reg = REGS.opt4048_reg_flags_t()
-
-        flag_reg.word = self.get_all_flags()
-
-        return flag_reg.bits.conv_ready_flag
+        return (self.get_all_flags() >> 2) & 1
 
     def get_too_bright_flag(self):
         """
@@ -476,11 +1031,7 @@ class QwOpt4048:
         :return: Flag that indicates lux is above the current range.
         :rtype: bool
         """
-        flag_reg = REGS.opt4048_reg_flags_t()
-
-        flag_reg.word = self.get_all_flags()
-
-        return flag_reg.bits.flag_high
+        return (self.get_all_flags() >> 1) & 1
 
     def get_too_dim_flag(self):
         """
@@ -489,11 +1040,7 @@ class QwOpt4048:
         :return: Flag that indicates lux is below the current range.
         :rtype: bool
         """
-        flag_reg = REGS.opt4048_reg_flags_t()
-
-        flag_reg.word = self.get_all_flags()
-
-        return flag_reg.bits.flag_low
+        return (self.get_all_flags() >> 0) & 1
 
     def set_fault_count(self, count):
         """
@@ -503,20 +1050,7 @@ class QwOpt4048:
         :return: None
         """
 
-        block = self._i2c.readBlock(self.address, REGS.SFE_OPT4048_REGISTER_CONTROL, 2)
-
-        control_reg = (block[0] << 8) | block[1]
-        control_reg &= ~0x0003
-        control_reg |= count
-
-        block = control_reg >> 8
-        block = control_reg & 0x00FF
-
-        self._i2c.writeBlock(
-            self.address,
-            REGS.SFE_OPT4048_REGISTER_CONTROL,
-            block,
-        )
+        self._update_register(REGS.SFE_OPT4048_REGISTER_CONTROL, 0x0003, count)
 
     def get_fault_count(self):
         """
@@ -525,9 +1059,7 @@ class QwOpt4048:
         :rtype: int
         """
 
-        block = self._i2c.readBlock(self.address, REGS.SFE_OPT4048_REGISTER_CONTROL, 2)
-
-        control_reg = (block[0] << 8) | block[1]
+        control_reg = self._read_register(REGS.SFE_OPT4048_REGISTER_CONTROL)
 
         return control_reg & 0x0003
 
@@ -538,21 +1070,8 @@ class QwOpt4048:
         :type thresh: int
         :return: None
         """
-        block = self._i2c.readBlock(
-            self.address, REGS.SFE_OPT4048_REGISTER_THRESH_L_EXP_RES, 2
-        )
-
-        thresh_reg = (block[0] << 8) | block[1]
-        thresh_reg &= ~0xF000
-        thresh_reg |= thresh << 12
-
-        block[0] = thresh_reg >> 8
-        block[1] = thresh_reg & 0x00FF
-
-        self._i2c.writeBlock(
-            self.address,
-            REGS.SFE_OPT4048_REGISTER_THRESH_L_EXP_RES,
-            block,
+        self._update_register(
+            REGS.SFE_OPT4048_REGISTER_THRESH_L_EXP_RES, 0xF000, thresh << 12
         )
 
     def get_threshold_low(self):
@@ -561,10 +1080,7 @@ class QwOpt4048:
         :return: Low interrupt threshold value.
         :rtype: int
         """
-        block = self._i2c.readBlock(
-            self.address, REGS.SFE_OPT4048_REGISTER_THRESH_L_EXP_RES, 2)
-
-        thresh_reg = (block[0] << 8) | block[1]
+        thresh_reg = self._read_register(REGS.SFE_OPT4048_REGISTER_THRESH_L_EXP_RES)
 
         return thresh_reg >> 12
 
@@ -575,21 +1091,8 @@ class QwOpt4048:
         :type thresh: int
         :return: None
         """
-        block = self._i2c.readBlock(
-            self.address, REGS.SFE_OPT4048_REGISTER_THRESH_H_EXP_RES, 2
-        )
-
-        thresh_reg = (block[0] << 8) | block[1]
-        thresh_reg &= ~0xF000
-        thresh_reg |= thresh << 12
-
-        block[0] = thresh_reg >> 8
-        block[1] = thresh_reg & 0x00FF
-
-        self._i2c.writeBlock(
-            self.address,
-            REGS.SFE_OPT4048_REGISTER_THRESH_H_EXP_RES,
-            block,
+        self._update_register(
+            REGS.SFE_OPT4048_REGISTER_THRESH_H_EXP_RES, 0xF000, thresh << 12
         )
 
     def get_threshold_high(self):
@@ -598,13 +1101,57 @@ class QwOpt4048:
         :return: High interrupt threshold value.
         :rtype: int
         """
-        block = self._i2c.readBlock(
-            self.address, REGS.SFE_OPT4048_REGISTER_THRESH_H_EXP_RES, 2
+        thresh_reg = self._read_register(REGS.SFE_OPT4048_REGISTER_THRESH_H_EXP_RES)
+
+        return thresh_reg >> 12
+
+    def set_thresholds(self, low, high, channel=1):
+        """
+        Set both interrupt thresholds and the channel they are compared with. The
+        thresholds are written together in one burst to registers 0x08 - 0x09, or
+        one at a time with the I2C burst setting off, the channel only if it
+        changes. Combined with the fault count this lets the
+        device ignore small changes of the light on its own.
+        :param low: Low threshold in ADC codes.
+        :type low: int
+        :param high: High threshold in ADC codes.
+        :type high: int
+        :param channel: Channel compared with the thresholds, 0 - 3, or None to
+            leave it unchanged.
+        :type channel: int
+        :return: None
+        """
+        self._write_registers(
+            REGS.SFE_OPT4048_REGISTER_THRESH_L_EXP_RES,
+            [encode_threshold(low), encode_threshold(high)],
         )
 
-        thresh_reg = (block[0] << 8) | block[1]
+        if channel is not None:
+            self.apply_config(sfe_config_t(threshold_channel=channel))
 
-        return thresh_reg >> 12
+    def set_lux_thresholds(self, low, high):
+        """
+        Set both interrupt thresholds in lux, compared with channel 1, the channel
+        lux is calculated from.
+        :param low: Low threshold in lux.
+        :type low: float
+        :param high: High threshold in lux.
+        :type high: float
+        :return: None
+        """
+        scale = self.cie_matrix[1][3]
+
+        self.set_thresholds(low / scale, high / scale, channel=1)
+
+    def get_thresholds(self):
+        """
+        Retrieve both interrupt thresholds and the channel they are compared with.
+        :return: Low and high thresholds in ADC codes and the channel.
+        :rtype: tuple
+        """
+        low, high, _, int_control = self.get_config_registers()
+
+        return decode_threshold(low), decode_threshold(high), (int_control >> 5) & 0x03
 
     def set_i2c_burst(self, enable=True):
         """
@@ -613,20 +1160,7 @@ class QwOpt4048:
         :type enable: bool
         :return: None
         """
-        block = self._i2c.readBlock(self.address, REGS.SFE_OPT4048_REGISTER_INT_CONTROL, 2)
-
-        int_control_reg = (block[0] << 8) | block[1]
-        int_control_reg &= ~0x0001
-        int_control_reg |= enable
-
-        block = int_control_reg >> 8
-        block = int_control_reg & 0x00FF
-
-        self._i2c.writeBlock(
-            self.address,
-            REGS.SFE_OPT4048_REGISTER_INT_CONTROL,
-            block,
-        )
+        self._update_register(REGS.SFE_OPT4048_REGISTER_INT_CONTROL, 0x0001, enable)
 
     def get_i2c_burst(self):
         """
@@ -635,11 +1169,7 @@ class QwOpt4048:
         :return: I2C burst setting.
         :rtype: bool
         """
-        block = self._i2c.readBlock(
-            self.address, REGS.SFE_OPT4048_REGISTER_INT_CONTROL, 2
-        )
-
-        int_control_reg = (block[0] << 8) | block[1]
+        int_control_reg = self._read_register(REGS.SFE_OPT4048_REGISTER_INT_CONTROL)
 
         return int_control_reg & 0x0001
 
@@ -649,24 +1179,11 @@ class QwOpt4048:
         :return: ADC value of channel 0.
         :rtype: int
         """
-        adc_code = 0
-        mantissa = 0
-
-        adc_reg = REGS.opt4048_reg_exp_res_ch0_t()
-        adc1_reg = REGS.opt4048_reg_res_cnt_crc_ch0_t()
-
         block = self._i2c.readBlock(
             self.address, REGS.SFE_OPT4048_REGISTER_EXP_RES_CH0, 4
         )
 
-        adc_reg.word = (block[0] << 8) | block[1]
-        adc1_reg.word = (block[2] << 8) | block[3]
-
-        mantissa = (adc_reg.bits.result_msb_ch0 << 8) | adc1_reg.bits.result_lsb_ch0
-
-        adc_code = mantissa << adc_reg.bits.exponent_ch0
-
-        return adc_code
+        return decode_channel(block)[0]
 
     def get_adc_ch1(self):
         """
@@ -674,24 +1191,11 @@ class QwOpt4048:
         :return: ADC value of channel 1.
         :rtype: int
         """
-        adc_code = 0
-        mantissa = 0
-
-        adc_reg = REGS.opt4048_reg_exp_res_ch1_t()
-        adc1_reg = REGS.opt4048_reg_res_cnt_crc_ch1_t()
-
         block = self._i2c.readBlock(
             self.address, REGS.SFE_OPT4048_REGISTER_EXP_RES_CH1, 4
         )
 
-        adc_reg.word = (block[0] << 8) | block[1]
-        adc1_reg.word = (block[2] << 8) | block[3]
-
-        mantissa = (adc_reg.bits.result_msb_ch1 << 8) | adc1_reg.bits.result_lsb_ch1
-
-        adc_code = mantissa << adc_reg.bits.exponent_ch1
-
-        return adc_code
+        return decode_channel(block)[0]
 
     def get_adc_ch2(self):
         """
@@ -699,24 +1203,11 @@ class QwOpt4048:
         :return: ADC value of channel 2.
         :rtype: int
         """
-        adc_code = 0
-        mantissa = 0
-
-        adc_reg = REGS.opt4048_reg_exp_res_ch2_t()
-        adc1_reg = REGS.opt4048_reg_res_cnt_crc_ch2_t()
-
         block = self._i2c.readBlock(
             self.address, REGS.SFE_OPT4048_REGISTER_EXP_RES_CH2, 4
         )
 
-        adc_reg.word = (block[0] << 8) | block[1]
-        adc1_reg.word = (block[2] << 8) | block[3]
-
-        mantissa = (adc_reg.bits.result_msb_ch2 << 8) | adc1_reg.bits.result_lsb_ch2
-
-        adc_code = mantissa << adc_reg.bits.exponent_ch2
-
-        return adc_code
+        return decode_channel(block)[0]
 
     def get_adc_ch3(self):
         """
@@ -724,24 +1215,11 @@ class QwOpt4048:
         :return: ADC value of channel 3.
         :rtype: int
         """
-        adc_code = 0
-        mantissa = 0
-
-        adc_reg = REGS.opt4048_reg_exp_res_ch3_t()
-        adc1_reg = REGS.opt4048_reg_res_cnt_crc_ch3_t()
-
         block = self._i2c.readBlock(
             self.address, REGS.SFE_OPT4048_REGISTER_EXP_RES_CH3, 4
         )
 
-        adc_reg.word = (block[0] << 8) | block[1]
-        adc1_reg.word = (block[2] << 8) | block[3]
-
-        mantissa = (adc_reg.bits.result_msb_ch3 << 8) | adc1_reg.bits.result_lsb_ch3
-
-        adc_code = mantissa << adc_reg.bits.exponent_ch3
-
-        return adc_code
+        return decode_channel(block)[0]
 
     def get_all_adc(self):
         """
@@ -757,76 +1235,475 @@ class QwOpt4048:
 
         return color
 
+    def _read_channels(self, channels=4):
+        """
+        Read all four channels of the OPT4048 with a single 16-byte burst and check
+        their CRCs according to crc_policy.
+        :param channels: Only read the first channels, the others are returned as
+            zero.
+        :type channels: int
+        :return: ADC codes, exponents, counters and CRCs, one tuple per field, and
+            whether every CRC matched.
+        :rtype: tuple
+        """
+        attempts = self.crc_retries + 1 if self.crc_policy == OPT4048_CRC_RETRY else 1
+        # Zero words of the unread channels decode to 0 with a matching CRC
+        padding = [0] * (16 - 4 * channels)
+
+        for _ in range(attempts):
+            buff = self._i2c.readBlock(
+                self.address, REGS.SFE_OPT4048_REGISTER_EXP_RES_CH0, 4 * channels
+            )
+
+            if padding:
+                buff = list(buff) + padding
+
+            codes, exponents, mantissas, counters, crcs = decode_burst(buff)
+            bad = []
+
+            if self.crc_policy != OPT4048_CRC_IGNORE:
+                for ch in range(4):
+                    if calc_crc(exponents[ch], mantissas[ch], counters[ch]) != crcs[ch]:
+                        self.crc_errors[ch] += 1
+                        bad.append(ch)
+
+            if not bad:
+                break
+
+        if bad and self.crc_policy != OPT4048_CRC_MARK:
+            raise Opt4048CrcError(bad)
+
+        return codes, exponents, counters, crcs, not bad
+
     def get_all_channel_data(self, color):
         """
         Retrieve the ADC values of all channels of the OPT4048.
         :return: ADC values of all channels.
         :rtype: sfe_color_t
         """
-        adc0_msb = REGS.opt4048_reg_exp_res_ch0_t()
-        adc0_lsb = REGS.opt4048_reg_res_cnt_crc_ch0_t()
+        codes, _, counters, crcs, valid = self._read_channels()
 
-        adc1_msb = REGS.opt4048_reg_exp_res_ch1_t()
-        adc1_lsb = REGS.opt4048_reg_res_cnt_crc_ch1_t()
+        color.red, color.green, color.blue, color.white = codes
+        color.counterR, color.counterG, color.counterB, color.counterW = counters
+        color.CRCR, color.CRCG, color.CRCB, color.CRCW = crcs
+        color.valid = valid
 
-        adc2_msb = REGS.opt4048_reg_exp_res_ch2_t()
-        adc2_lsb = REGS.opt4048_reg_res_cnt_crc_ch2_t()
+        return color
 
-        adc3_msb = REGS.opt4048_reg_exp_res_ch3_t()
-        adc3_lsb = REGS.opt4048_reg_res_cnt_crc_ch3_t()
+    def measure(self):
+        """
+        Read all four channels with a single burst and return them as one coherent
+        snapshot. CIE x/y, lux and CCT are computed from the snapshot on first use.
+        :return: The measurement.
+        :rtype: sfe_measurement_t
+        """
+        return self._make_measurement(*self._read_channels())
 
-        buff = self._i2c.readBlock(
-            self.address, REGS.SFE_OPT4048_REGISTER_EXP_RES_CH0, 16
+    def read_if_new(self):
+        """
+        Return a new measurement only if the device has finished a conversion of all
+        four channels since the last one was read. The channels are converted in
+        order, so only channel 3 (4 bytes) is read to compare the sample counter, and
+        all four channels are read once it has changed.
+
+        Each channel counts its own conversions, so the counters of a complete
+        conversion keep fixed offsets from each other. A read that lands after
+        channel 0 of the next conversion is done mixes two conversions and shows a
+        step in those offsets, and None is returned until the next one completes.
+        A CONTROL write restarts the conversions at channel 0 and shifts the
+        offsets. In continuous mode the new offsets are taken from a conversion
+        whose channel 3 is seen to complete less than a conversion time after the
+        previous call, or, when calls are further apart, from two successive
+        conversions that agree.
+        :return: The new measurement, or None if there is no new conversion.
+        :rtype: sfe_measurement_t
+        """
+        tail = self._i2c.readBlock(
+            self.address, REGS.SFE_OPT4048_REGISTER_EXP_RES_CH3, 4
         )
+        counter = (tail[3] >> 4) & 0x0F
 
-        adc0_msb.word = (buff[0] << 8) | buff[1]
-        adc0_lsb.word = (buff[2] << 8) | buff[3]
+        probe, self._probe = self._probe, (counter, time.monotonic())
 
-        adc1_msb.word = (buff[4] << 8) | buff[5]
-        adc1_lsb.word = (buff[6] << 8) | buff[7]
+        if self._last_counters is not None and counter == self._last_counters[3]:
+            return None
 
-        adc2_msb.word = (buff[8] << 8) | buff[9]
-        adc2_lsb.word = (buff[10] << 8) | buff[11]
+        if self._held is not None and counter == self._held[0]:
+            return None
 
-        adc3_msb.word = (buff[12] << 8) | buff[13]
-        adc3_lsb.word = (buff[14] << 8) | buff[15]
+        codes, exponents, counters, crcs, valid = self._read_channels()
+        offsets = tuple((counters[ch] - counters[3]) & 0x0F for ch in range(3))
 
-        mantissa_ch0 = (
-            adc0_msb.bits.result_msb_ch0 << 8
-        ) | adc0_lsb.bits.result_lsb_ch0
-        adc_code_ch0 = mantissa_ch0 << adc0_msb.bits.exponent_ch0
+        if offsets != self._frame_offsets and self._may_be_torn(probe, counter):
+            held, self._held = self._held, (counters[3], offsets)
+            if held is None or held[1] != offsets:
+                return None
 
-        mantissa_ch1 = (
-            adc1_msb.bits.result_msb_ch1 << 8
-        ) | adc1_lsb.bits.result_lsb_ch1
-        adc_code_ch1 = mantissa_ch1 << adc1_msb.bits.exponent_ch1
+        self._held = None
+        self._frame_offsets = offsets
 
-        mantissa_ch2 = (
-            adc2_msb.bits.result_msb_ch2 << 8
-        ) | adc2_lsb.bits.result_lsb_ch2
-        adc_code_ch2 = mantissa_ch2 << adc2_msb.bits.exponent_ch2
+        return self._make_measurement(codes, exponents, counters, crcs, valid)
 
-        mantissa_ch3 = (
-            adc3_msb.bits.result_msb_ch3 << 8
-        ) | adc3_lsb.bits.result_lsb_ch3
-        adc_code_ch3 = mantissa_ch3 << adc3_msb.bits.exponent_ch3
+    def _may_be_torn(self, probe, counter):
+        """
+        Whether the channels just read could include channel 0 of the conversion
+        after the one channel 3 belongs to.
+        """
+        control = self._read_register(REGS.SFE_OPT4048_REGISTER_CONTROL)
 
-        color.red = adc_code_ch0
-        color.green = adc_code_ch1
-        color.blue = adc_code_ch2
-        color.white = adc_code_ch3
+        # Only continuous mode goes on to a next conversion
+        if (control & 0x0030) >> 4 != (
+            REGS.opt4048OperationModeT.OPERATION_MODE_CONTINUOUS.value
+        ):
+            return False
 
-        color.counterR = adc0_lsb.bits.counter_ch0
-        color.counterG = adc1_lsb.bits.counter_ch1
-        color.counterB = adc2_lsb.bits.counter_ch2
-        color.counterW = adc3_lsb.bits.counter_ch3
+        if probe is None or probe[0] == counter:
+            return True
 
-        color.CRCR = adc0_lsb.bits.crc_ch0
-        color.CRCG = adc1_lsb.bits.crc_ch1
-        color.CRCB = adc2_lsb.bits.crc_ch2
-        color.CRCW = adc3_lsb.bits.crc_ch3
+        # Channel 3 completed after the previous probe, so channel 0 can only have
+        # been converted again if that was at least a conversion time ago.
+        tconv = _CONVERSION_TIME_SECONDS[(control & 0x03C0) >> 6]
 
-        return color
+        return time.monotonic() - probe[1] >= tconv
+
+    def read_into(self, buffer, timeout=None):
+        """
+        Read all four channels with a single burst and decode them straight into the
+        next slot of a ring buffer, without building a measurement object. CRCs are
+        checked according to crc_policy.
+        :param buffer: The buffer to fill.
+        :type buffer: opt4048_buffer.SampleRingBuffer
+        :param timeout: Maximum time to wait for space in a blocking buffer.
+        :type timeout: float
+        :return: The slot written, or None if the buffer stayed full.
+        :rtype: int
+        """
+        attempts = self.crc_retries + 1 if self.crc_policy == OPT4048_CRC_RETRY else 1
+        check = self.crc_policy != OPT4048_CRC_IGNORE
+
+        slot = buffer.reserve(timeout)
+        if slot is None:
+            return None
+
+        codes = buffer.codes
+        exponents = buffer.exponents
+        counters = buffer.counters
+        crcs = buffer.crcs
+        base = 4 * slot
+
+        for _ in range(attempts):
+            buff = self._i2c.readBlock(
+                self.address, REGS.SFE_OPT4048_REGISTER_EXP_RES_CH0, 16
+            )
+
+            # Bit mask of the channels with a CRC mismatch
+            bad = 0
+
+            # Decoded in place rather than with decode_burst(), so the hot path
+            # doesn't allocate a bytes copy and tuples for every sample.
+            for ch in range(4):
+                i = 4 * ch
+                j = base + ch
+
+                msb = buff[i]
+                lsb = buff[i + 3]
+
+                exponent = msb >> 4
+                mantissa = ((msb & 0x0F) << 16) | (buff[i + 1] << 8) | buff[i + 2]
+                counter = lsb >> 4
+                crc = lsb & 0x0F
+
+                codes[j] = mantissa << exponent
+                exponents[j] = exponent
+                counters[j] = counter
+                crcs[j] = crc
+
+                if check and calc_crc(exponent, mantissa, counter) != crc:
+                    self.crc_errors[ch] += 1
+                    bad |= 1 << ch
+
+            if not bad:
+                break
+
+        buffer.timestamps[slot] = time.monotonic()
+        buffer.valid[slot] = not bad
+        buffer.commit()
+
+        # The sample stays in the buffer marked invalid even if this raises
+        if bad and self.crc_policy != OPT4048_CRC_MARK:
+            raise Opt4048CrcError([ch for ch in range(4) if bad & (1 << ch)])
+
+        return slot
+
+    def get_frame_period(self):
+        """
+        Work out how often the device produces a new measurement in continuous mode:
+        it always converts all four channels, one after another, so this is four
+        times the current conversion time, whatever values are used.
+        :return: Frame period in seconds.
+        :rtype: float
+        """
+        return 4 * _CONVERSION_TIME_SECONDS[self.get_conversion_time()]
+
+    def stream(self, count=None, timeout=None):
+        """
+        Generate measurements as fast as the device produces them in continuous mode.
+        The host sleeps for a frame period between reads and read_if_new() makes
+        sure each measurement is a new, complete conversion. When a read comes too
+        early it is retried shortly after, so the schedule locks onto the device
+        and doesn't drift with the time spent reading or processing.
+        :param count: Number of measurements to generate, None for no limit.
+        :type count: int
+        :param timeout: End the stream if no new conversion arrives for this many
+            seconds, e.g. because the device isn't in continuous mode. None to wait
+            forever.
+        :type timeout: float
+        :return: Generator of measurements.
+        :rtype: sfe_measurement_t
+        """
+        period = self.get_frame_period()
+        backoff = period / 16
+        deadline = time.monotonic() + period
+        last = time.monotonic()
+        early = False
+        n = 0
+
+        while count is None or n < count:
+            delay = deadline - time.monotonic()
+
+            if delay > 0:
+                time.sleep(delay)
+
+            before = time.monotonic()
+            measurement = self.read_if_new()
+
+            if measurement is None:
+                if timeout is not None and before - last >= timeout:
+                    return
+
+                deadline = before + backoff
+                early = True
+                continue
+
+            last = before
+
+            # After a read that came too early the conversion completed within the
+            # last backoff, so lock onto it. Aim slightly early either way, so
+            # the host and device clocks can't slowly drift into a read that
+            # lands after channel 0 of the next conversion.
+            deadline = (before if early else deadline) + period - backoff / 2
+            early = False
+
+            yield measurement
+
+            n += 1
+
+    def wait_for_conversion(self, timeout=None, expected=None):
+        """
+        Wait until the conversion ready flag is set. The host sleeps through most of
+        the expected conversion, then polls the FLAGS register with an exponential
+        backoff. The first poll adapts to how long previous conversions took.
+        Reading FLAGS clears the flag.
+        :param timeout: Maximum time to wait in seconds, None to wait forever.
+        :type timeout: float
+        :param expected: Time until the conversion should complete in seconds.
+            Defaults to a full frame of four channels.
+        :type expected: float
+        :return: True if a conversion is ready, False on timeout.
+        :rtype: bool
+        """
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+
+        if expected is None:
+            expected = self.get_frame_period()
+
+        delay = expected * self._ready_ratio * 0.9
+        backoff = max(expected / 32, 0.0002)
+
+        while True:
+            if deadline is not None:
+                delay = min(delay, deadline - time.monotonic())
+
+            if delay > 0:
+                time.sleep(delay)
+
+            if self.get_all_flags() & _FLAG_CONV_READY:
+                break
+
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+
+            delay = backoff
+            backoff = min(backoff * 2, max(expected / 4, 0.0002))
+
+        if expected > 0:
+            ratio = (time.monotonic() - start) / expected
+            self._ready_ratio += 0.25 * (min(ratio, 2.0) - self._ready_ratio)
+
+        return True
+
+    def read_next(self, timeout=None, expected=None):
+        """
+        Wait for the next conversion to complete and read it.
+        :param timeout: Maximum time to wait in seconds, None to wait forever.
+        :type timeout: float
+        :param expected: Time until the conversion should complete in seconds,
+            see wait_for_conversion().
+        :type expected: float
+        :return: The measurement, or None on timeout.
+        :rtype: sfe_measurement_t
+        """
+        if not self.wait_for_conversion(timeout, expected):
+            return None
+
+        return self.measure()
+
+    def measure_once(
+        self,
+        conversion_time=None,
+        channels=4,
+        qwake=False,
+        auto_range=False,
+        wait=OPT4048_WAIT_TIMER,
+        source=None,
+        timeout=None,
+    ):
+        """
+        Trigger a single conversion and read it as soon as it is done. The trigger is
+        a single write of CONTROL (no read with the shadow cache enabled), and the
+        device returns to power-down by itself afterwards.
+
+        The channels are converted in order, so when fewer than four are needed the
+        timer wait reads them back before the rest of the conversion has finished,
+        e.g. channels=2 for lux. Values that need channels that weren't read, like
+        the CIE coordinates and CCT with channels < 3, are None then.
+
+        :param conversion_time: Conversion time per channel, a
+            opt4048ConversionTimeT. The current one if None.
+        :type conversion_time: opt4048ConversionTimeT
+        :param channels: Number of channels needed, counting from channel 0.
+        :type channels: int
+        :param qwake: Keep the device partly powered between conversions, so the next
+            one starts without the wake-up delay at the cost of a higher standby
+            current.
+        :type qwake: bool
+        :param auto_range: Use OPERATION_MODE_AUTO_ONE_SHOT, which resets the
+            automatic range for this conversion, instead of OPERATION_MODE_ONE_SHOT.
+        :type auto_range: bool
+        :param wait: OPT4048_WAIT_TIMER to sleep for the expected conversion time, or
+            OPT4048_WAIT_FLAG to poll the conversion ready flag.
+        :type wait: int
+        :param source: Edge source connected to the INT pin, see opt4048_interrupt,
+            to wait for instead. The INT pin must be set up for data ready.
+        :param timeout: Maximum time to wait in seconds, None to wait forever.
+        :type timeout: float
+        :return: The measurement with its latency, or None on timeout.
+        :rtype: sfe_measurement_t
+        """
+        control = REGS.SFE_OPT4048_REGISTER_CONTROL
+        current = self._read_register(control)
+        reg = current
+
+        if conversion_time is not None:
+            reg = (reg & ~0x03C0) | (_enum_value(conversion_time) << 6)
+
+        if auto_range:
+            mode = REGS.opt4048OperationModeT.OPERATION_MODE_AUTO_ONE_SHOT
+        else:
+            mode = REGS.opt4048OperationModeT.OPERATION_MODE_ONE_SHOT
+
+        reg = (reg & ~0x8030) | (mode.value << 4) | (0x8000 if qwake else 0)
+
+        tconv = _CONVERSION_TIME_SECONDS[(reg & 0x03C0) >> 6]
+        wake = 0.0 if current & 0x8000 else _WAKE_TIME_SECONDS
+
+        previous = self._last_counters or self._once_counters
+
+        # Always written, even if the shadow cache holds the same value: the cache
+        # keeps CONTROL in power-down, as the device leaves it after a conversion.
+        start = time.monotonic()
+        self._write_register(control, reg)
+
+        deadline = None if timeout is None else start + timeout
+
+        if source is not None:
+            if not source.wait(timeout):
+                return None
+        elif wait == OPT4048_WAIT_FLAG:
+            if not self.wait_for_conversion(timeout, wake + 4 * tconv):
+                return None
+        else:
+            ready = start + wake + channels * tconv
+            if deadline is not None:
+                ready = min(ready, deadline)
+
+            delay = ready - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        # The last channel needed shows a new sample counter once it is converted
+        backoff = max(tconv / 8, 0.0002)
+
+        while True:
+            codes, exponents, counters, crcs, valid = self._read_channels(
+                channels=channels
+            )
+
+            if len(previous or ()) < channels:
+                break
+
+            if counters[channels - 1] != previous[channels - 1]:
+                break
+
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+
+            time.sleep(backoff)
+
+        if channels < 4:
+            self._once_counters = counters[:channels]
+
+        return self._make_measurement(
+            codes, exponents, counters, crcs, valid, time.monotonic() - start, channels
+        )
+
+    def _make_measurement(
+        self, codes, exponents, counters, crcs, valid, latency=0.0, channels=4
+    ):
+        """
+        Build a measurement from decoded channel data and work out how many
+        conversions were missed since the previous one from the sample counters.
+        :return: The measurement.
+        :rtype: sfe_measurement_t
+        """
+        missed = 0
+
+        # Channel 3 is converted once per complete conversion. The counter is only 4
+        # bits, so at most 15 missed conversions can be seen.
+        if channels < 4:
+            # Without channel 3 the next measurement has nothing to compare with
+            self._last_counters = None
+        else:
+            last = self._last_counters
+            if last is not None and counters[3] != last[3]:
+                missed = (counters[3] - last[3] - 1) & 0x0F
+
+            self._last_counters = counters
+
+        return sfe_measurement_t(
+            codes=codes,
+            exponents=exponents,
+            counters=counters,
+            crcs=crcs,
+            timestamp=time.monotonic(),
+            valid=valid,
+            missed=missed,
+            latency=latency,
+            channels=channels,
+            cie_matrix=self.cie_matrix,
+            cct_algorithm=self.cct_algorithm,
+        )
 
     def get_lux(self):
         """
@@ -844,22 +1721,7 @@ class QwOpt4048:
         :return: CIEx value.
         :rtype: float
         """
-        x, y, z = 0, 0, 0
-        color = sfe_color_t()
-
-        self.get_all_channel_data(color)
-
-        for row in range(self.OPT_MATRIX_ROWS):
-            x += color.red * self.cie_matrix[row][0]
-            y += color.green * self.cie_matrix[row][1]
-            z += color.blue * self.cie_matrix[row][2]
-
-        if (x + y + z) == 0:
-            return 0
-
-        # Calculate the CIE x value, all of the
-        # math required to do this is in the datasheet.
-        return x / (x + y + z)
+        return self.measure().CIEx
 
     def get_CIEy(self):
         """
@@ -867,22 +1729,7 @@ class QwOpt4048:
         :return: CIEy value.
         :rtype: float
         """
-        x, y, z = 0, 0, 0
-        color = sfe_color_t()
-
-        self.get_all_channel_data(color)
-
-        for row in range(self.OPT_MATRIX_ROWS):
-            x += color.red * self.cie_matrix[row][0]
-            y += color.green * self.cie_matrix[row][1]
-            z += color.blue * self.cie_matrix[row][2]
-
-        if (x + y + z) == 0:
-            return 0
-
-        # Calculate the CIE y value, all of the
-        # math required to do this is in the datasheet.
-        return y / (x + y + z)
+        return self.measure().CIEy
 
     def get_CCT(self):
         """
@@ -890,26 +1737,4 @@ class QwOpt4048:
         :return: CCT value.
         :rtype: float
         """
-        x, y, z = 0, 0, 0
-        color = sfe_color_t()
-
-        self.get_all_channel_data(color)
-
-        for row in range(self.OPT_MATRIX_ROWS):
-            x += color.red * self.cie_matrix[row][0]
-            y += color.green * self.cie_matrix[row][1]
-            z += color.blue * self.cie_matrix[row][2]
-
-        if (x + y + z) == 0:
-            return 0
-
-        CIEx = x / (x + y + z)
-        CIEy = y / (x + y + z)
-
-        # Calculate the correlated color temperature, all of the
-        # math required to do this is in the datasheet.
-        n = (CIEx - 0.3320) / (0.1858 - CIEy)
-
-        CCT = 432 * n**3 + 3601 * n**2 + 6861 * n + 5517
-
-        return CCT
+        return self.measure().CCT
@@ -66,6 +66,9 @@ setup(
 
     install_requires=['sparkfun_qwiic_i2c'],
 
+    # NumPy is only needed for batch conversion of logged samples
+    extras_require={'numpy': ['numpy']},
+
     # Choose your license
     license='MIT',
 
@@ -96,6 +99,22 @@ setup(
 
     # You can just specify the packages manually here if your project is
     # simple. Or you can use find_packages().
-    py_modules=["qwiic_opt4048"],
+    py_modules=[
+        "qwiic_opt4048",
+        "opt4048_registers",
+        "opt4048_interrupt",
+        "opt4048_async",
+        "opt4048_array",
+        "opt4048_buffer",
+        "opt4048_batch",
+        "opt4048_cct",
+        "opt4048_simulator",
+        "opt4048_instrument",
+        "opt4048_record",
+        "opt4048_capture",
+        "opt4048_autorange",
+        "opt4048_pipeline",
+        "opt4048_power",
+    ],
 
 )
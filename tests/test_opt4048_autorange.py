@@ -0,0 +1,69 @@
+# -------------------------------------------------------------------------------
+# test_opt4048_autorange.py
+#
+# Tests of the AutoRangeController against the simulated device.
+# -------------------------------------------------------------------------------
+# Written by SparkFun Electronics, November 2023
+#
+# This python library supports the SparkFun Electroncis Qwiic ecosystem
+#
+# More information on Qwiic is at https://www.sparkfun.com/qwiic
+# ===============================================================================
+# SPDX-License-Identifier: MIT
+#
+# Copyright (c) 2023 SparkFun Electronics
+# ===============================================================================
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+pytest.importorskip("qwiic_i2c")
+
+import qwiic_opt4048
+import opt4048_registers as REGS
+from opt4048_autorange import AutoRangeController
+from opt4048_simulator import Opt4048Simulator
+
+
+def test_measure_through_range_changes():
+    # Real time simulator, read_next() sleeps until the conversions are done
+    sim = Opt4048Simulator(light=(300000, 600000, 100000, 50000))
+    sensor = qwiic_opt4048.QwOpt4048(i2c_driver=sim, shadow_cache=True)
+    sensor.begin()
+
+    conversion_time = REGS.opt4048ConversionTimeT.CONVERSION_TIME_1MS8
+    sensor.apply_config(
+        qwiic_opt4048.sfe_config_t(
+            range=REGS.opt4048RangeT.RANGE_2KLUX2,
+            conversion_time=conversion_time,
+            operation_mode=REGS.opt4048OperationModeT.OPERATION_MODE_CONTINUOUS,
+        )
+    )
+
+    controller = AutoRangeController(
+        sensor,
+        min_conversion_time=conversion_time,
+        max_conversion_time=conversion_time,
+    )
+
+    # Brightest channel code and the range it settles on
+    steps = [(1500000, 1), (3000000, 2), (6000000, 3), (100000, 0)]
+
+    for peak, color_range in steps:
+        sim.set_light((peak // 2, peak, peak // 6, peak // 12))
+
+        for _ in range(20):
+            measurement = controller.measure(timeout=1.0)
+            assert measurement is not None
+
+            if measurement.exponents == (color_range,) * 4:
+                break
+
+        assert controller.color_range == color_range
+        assert measurement.exponents == (color_range,) * 4
+
+    assert controller.changes >= len(steps)
@@ -0,0 +1,69 @@
+# -------------------------------------------------------------------------------
+# test_opt4048_power.py
+#
+# Tests of the PowerScheduler against the simulated device.
+# -------------------------------------------------------------------------------
+# Written by SparkFun Electronics, November 2023
+#
+# This python library supports the SparkFun Electroncis Qwiic ecosystem
+#
+# More information on Qwiic is at https://www.sparkfun.com/qwiic
+# ===============================================================================
+# SPDX-License-Identifier: MIT
+#
+# Copyright (c) 2023 SparkFun Electronics
+# ===============================================================================
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+pytest.importorskip("qwiic_i2c")
+
+import qwiic_opt4048
+import opt4048_power
+import opt4048_registers as REGS
+from opt4048_simulator import Opt4048Simulator, VirtualClock
+
+
+class VirtualTime:
+    """
+    Stands in for the time module, so the host sleeps on the virtual clock of the
+    simulator.
+    """
+
+    def __init__(self, clock):
+        self.monotonic = clock
+        self.sleep = clock.advance
+
+
+def test_continuous_period_shorter_than_frame(monkeypatch):
+    clock = VirtualClock()
+    monkeypatch.setattr(qwiic_opt4048, "time", VirtualTime(clock))
+    monkeypatch.setattr(opt4048_power, "time", VirtualTime(clock))
+
+    sim = Opt4048Simulator(light=(100000, 200000, 30000, 5000), clock=clock)
+    sensor = qwiic_opt4048.QwOpt4048(i2c_driver=sim, shadow_cache=True)
+    sensor.begin()
+
+    conversion_time = REGS.opt4048ConversionTimeT.CONVERSION_TIME_1MS8
+    frame = 4 * qwiic_opt4048._CONVERSION_TIME_SECONDS[conversion_time.value]
+
+    with opt4048_power.PowerScheduler(
+        sensor, frame / 2, conversion_time=conversion_time
+    ) as scheduler:
+        assert scheduler.plan.mode == opt4048_power.OPT4048_POWER_CONTINUOUS
+        assert scheduler.period == frame
+
+        samples = list(scheduler.run(count=10))
+
+    assert len(samples) == 10
+
+    # Every sample is a new, complete conversion
+    for previous, measurement in zip(samples, samples[1:]):
+        assert measurement.counters[3] == (previous.counters[3] + 1) & 0x0F
+
+    assert all(len(set(m.counters)) == 1 for m in samples)
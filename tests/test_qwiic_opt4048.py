@@ -0,0 +1,203 @@
+# -------------------------------------------------------------------------------
+# test_qwiic_opt4048.py
+#
+# Tests of the QwOpt4048 driver against the simulated device.
+# -------------------------------------------------------------------------------
+# Written by SparkFun Electronics, November 2023
+#
+# This python library supports the SparkFun Electroncis Qwiic ecosystem
+#
+# More information on Qwiic is at https://www.sparkfun.com/qwiic
+# ===============================================================================
+# SPDX-License-Identifier: MIT
+#
+# Copyright (c) 2023 SparkFun Electronics
+# ===============================================================================
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+pytest.importorskip("qwiic_i2c")
+
+import qwiic_opt4048
+import opt4048_registers as REGS
+from opt4048_simulator import Opt4048Simulator, VirtualClock
+
+LIGHT = (100000, 200000, 30000, 5000)
+TCONV = 0.0065
+
+
+class VirtualTime:
+    """
+    Stands in for the time module of the driver, so it sleeps on the virtual
+    clock of the simulator.
+    """
+
+    def __init__(self, clock):
+        self.monotonic = clock
+        self.sleep = clock.advance
+
+
+@pytest.fixture
+def continuous(monkeypatch):
+    clock = VirtualClock()
+    monkeypatch.setattr(qwiic_opt4048, "time", VirtualTime(clock))
+
+    sim = Opt4048Simulator(light=LIGHT, clock=clock)
+    sensor = qwiic_opt4048.QwOpt4048(i2c_driver=sim)
+    sensor.begin()
+    sensor.apply_config(
+        qwiic_opt4048.sfe_config_t(
+            conversion_time=REGS.opt4048ConversionTimeT.CONVERSION_TIME_6MS5,
+            operation_mode=REGS.opt4048OperationModeT.OPERATION_MODE_CONTINUOUS,
+        )
+    )
+
+    return clock, sim, sensor
+
+
+def coherent(sim):
+    # The last conversion the simulator completed was channel 3, so the four
+    # channels just read come from the same conversion.
+    return sim._completed % 4 == 0
+
+
+def poll(clock, sim, sensor, steps):
+    frames = []
+
+    for _ in range(steps):
+        # Not a divisor of the conversion time, so the polls land at every phase
+        clock.advance(TCONV / 3.7)
+        measurement = sensor.read_if_new()
+
+        if measurement is not None:
+            assert coherent(sim), measurement.counters
+            frames.append(measurement)
+
+    return frames
+
+
+def test_read_if_new_coherent(continuous):
+    clock, sim, sensor = continuous
+
+    frames = poll(clock, sim, sensor, 400)
+
+    # 400 polls span 27 frames
+    assert len(frames) >= 26
+    assert all(m.missed == 0 for m in frames[1:])
+
+
+@pytest.mark.parametrize("channel", [1, 2, 3])
+def test_read_if_new_config_change_mid_frame(continuous, channel):
+    clock, sim, sensor = continuous
+
+    assert poll(clock, sim, sensor, 40)
+
+    # Restart the conversions after channels 0 - channel-1 of a frame are done,
+    # which leaves their counters one ahead of the other channels for good.
+    while sim._completed % 4 != channel:
+        clock.advance(TCONV / 3.7)
+        sensor.read_if_new()
+
+    color_range = REGS.opt4048RangeT.RANGE_9LUX.value
+    sensor.set_range(color_range)
+
+    frames = poll(clock, sim, sensor, 400)
+
+    assert len(frames) >= 25
+    assert all(m.exponents == (color_range,) * 4 for m in frames)
+
+
+def test_read_if_new_slow_polls(continuous):
+    clock, sim, sensor = continuous
+
+    sensor.set_range(REGS.opt4048RangeT.RANGE_9LUX.value)
+    frames = []
+
+    # Too far apart to tell when channel 3 completed
+    for _ in range(20):
+        clock.advance(4.3 * TCONV)
+        measurement = sensor.read_if_new()
+
+        if measurement is not None:
+            frames.append(measurement)
+
+    assert len(frames) >= 5
+
+
+def test_read_if_new_after_partial_one_shot(continuous):
+    clock, sim, sensor = continuous
+
+    sensor.apply_config(
+        qwiic_opt4048.sfe_config_t(
+            operation_mode=REGS.opt4048OperationModeT.OPERATION_MODE_POWER_DOWN
+        )
+    )
+    clock.advance(0.1)
+
+    # A one-shot of which only channels 0 - 1 are read before switching back to
+    # continuous mode part way through the conversion
+    control = sim.regs[REGS.SFE_OPT4048_REGISTER_CONTROL]
+    sensor._write_register(REGS.SFE_OPT4048_REGISTER_CONTROL, control | 0x0020)
+    clock.advance(2.5 * TCONV)
+    sensor.set_operation_mode(REGS.opt4048OperationModeT.OPERATION_MODE_CONTINUOUS.value)
+
+    assert len(poll(clock, sim, sensor, 400)) >= 25
+
+
+def test_measure_once_partial():
+    # Real time simulator, measure_once() sleeps until the conversion is done
+    sim = Opt4048Simulator(light=LIGHT)
+    sensor = qwiic_opt4048.QwOpt4048(i2c_driver=sim)
+    sensor.begin()
+    conversion_time = REGS.opt4048ConversionTimeT.CONVERSION_TIME_1MS8
+
+    last = sensor.measure_once(conversion_time, timeout=1.0)
+    assert last.CCT > 0
+
+    for _ in range(3):
+        measurement = sensor.measure_once(conversion_time, channels=2, timeout=1.0)
+
+        assert measurement.channels == 2
+        assert measurement.lux > 0
+        assert measurement.CIEx is None and measurement.CIEy is None
+        assert measurement.CCT is None and measurement.Duv is None
+        # A new conversion, not the channels of the previous one
+        assert measurement.counters[1] != last.counters[1]
+        last = measurement
+
+    measurement = sensor.measure_once(conversion_time, timeout=1.0)
+
+    assert measurement.channels == 4 and measurement.CCT > 0
+    assert measurement.counters[1] != last.counters[1]
+    assert measurement.missed == 0
+
+
+def test_stream_across_config_change(continuous):
+    clock, sim, sensor = continuous
+
+    frames = []
+    ranges = [
+        REGS.opt4048RangeT.RANGE_9LUX.value,
+        REGS.opt4048RangeT.RANGE_18LUX.value,
+        REGS.opt4048RangeT.RANGE_4KLUX5.value,
+    ]
+
+    for measurement in sensor.stream(timeout=1.0):
+        assert coherent(sim), measurement.counters
+        frames.append(measurement)
+
+        # Change the range part way through the next frame
+        if len(frames) % 10 == 0 and ranges:
+            clock.advance(1.5 * TCONV)
+            sensor.set_range(ranges.pop(0))
+
+        if len(frames) == 40:
+            break
+
+    assert len(frames) == 40
+    assert frames[-1].exponents == (REGS.opt4048RangeT.RANGE_4KLUX5.value,) * 4